@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import logging
 from datetime import datetime, timedelta, timezone
+from redis.exceptions import RedisError
+from app.core.cache import get_or_load
 from app.core.config import settings
-from app.db.database import get_db
+from app.db.database import get_db, get_supabase
+from app.db.statements import USER_BY_ID, USER_BY_USERNAME
 from app.models.user import UserCreate, User, Token
 import pytz
 
@@ -44,7 +47,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    db = get_db()
+    db = get_supabase()
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -60,7 +63,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 @router.post("/register", response_model=User)
 async def register_user(user: UserCreate):
-    db = get_db()
+    db = get_supabase()
     existing_user = db.table("users").select("*").eq("email", user.email).execute().data
     if existing_user:
         raise HTTPException(
@@ -86,25 +89,48 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or not str(user_id).isdigit():
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    db = get_db()
-    user = db.table("users").select("*").eq("user_id", user_id).execute()
-    
-    if not user.data:
+
+    user = await _get_user_by_id(int(user_id))
+    if user is None:
         raise credentials_exception
-    
-    return User(**user.data[0])
+    return User(**user)
 
 async def get_current_user_bearer(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+# Browsers cannot set headers on websocket handshakes or EventSource requests, so
+# streaming endpoints take the token in the query string. Query strings end up in
+# proxy and access logs; keep these tokens short-lived.
+async def get_current_user_ws(websocket: WebSocket, token: str = Query(...)):
+    try:
+        return await authenticate_token(token)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+async def get_current_user_query(token: str = Query(...)):
+    return await authenticate_token(token)
+
+async def _get_user_by_id(user_id: int):
+    async def load():
+        user = await get_db().fetch_one(USER_BY_ID, {"user_id": user_id})
+        return User(**user).model_dump(mode="json") if user is not None else None
+
+    try:
+        return await get_or_load(f"user:{user_id}", load, expiration=settings.CURRENT_USER_CACHE_SECONDS)
+    except RedisError as e:
+        logger.warning(f"User cache unavailable, reading from the database: {e}")
+        return await load()
+
+async def _get_user_by_username(username: str):
+    return await get_db().fetch_one(USER_BY_USERNAME, {"username": username})
+
+async def authenticate_token(token: str):
     try:
-        token = credentials.credentials
-        logger.info(f"Received token: {token[:10]}...")  # Log first 10 characters of the token
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        logger.info(f"Decoded payload: {payload}")
         username: str = payload.get("sub")
         if username is None:
             logger.error("Username not found in token payload")
@@ -116,10 +142,9 @@ async def get_current_user_bearer(credentials: HTTPAuthorizationCredentials = De
         logger.error(f"Unexpected error during token validation: {str(e)}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     
-    db = get_db()
-    user = db.table("users").select("*").eq("username", username).execute().data
+    user = await _get_user_by_username(username)
     if not user:
         logger.error(f"User not found: {username}")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     logger.info(f"User authenticated: {username}")
-    return User(**user[0])
\ No newline at end of file
+    return User(**user)
\ No newline at end of file
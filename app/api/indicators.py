@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from app.models.indicator import Indicator, IndicatorCreate
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.api.auth import get_current_user
 
 router = APIRouter()
@@ -10,7 +10,7 @@ router = APIRouter()
 @router.post("/indicators", response_model=Indicator)
 async def create_indicator(indicator: IndicatorCreate, current_user = Depends(get_current_user), db = Depends(get_db)):
     new_indicator = indicator.dict()
-    result = await db.execute(
+    result = await db.fetch_one(
         """
         INSERT INTO indicators (name, description, parameters)
         VALUES (:name, :description, :parameters)
@@ -21,7 +21,7 @@ async def create_indicator(indicator: IndicatorCreate, current_user = Depends(ge
     return Indicator(**result)
 
 @router.get("/indicators", response_model=List[Indicator])
-async def get_indicators(db = Depends(get_db)):
+async def get_indicators(db = Depends(get_read_db)):
     results = await db.fetch_all("SELECT * FROM indicators")
     return [Indicator(**result) for result in results]
 
@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import logging
 from app.services.polygon_service import polygon_ws
-from app.api.auth import get_current_user_bearer
+from app.services.bar_stream import bar_broadcaster, encode_batch
+from app.services.bar_store import DAY_SETTLE, bar_store, is_valid_symbol
+from app.services.historical_cache import day_chunk_cache
+from app.services.historical_data import (
+    decode_cursor, encode_cursor, fetch_bars, fetch_rollup_bars, iter_bar_chunks, load_bar_columns, rollup_table_for
+)
+from app.services.bar_aggregator import parse_timeframe
+from app.services.latest_data import BAR_KEYS, get_latest_bars
+from app.services.resampling import downsample_lttb, resample_ohlcv
+from app.utils.columnar import JSON, available_formats, columns_to_records, encode_columns, negotiate_format, rows_to_columns
+from app.api.auth import get_current_user_bearer, get_current_user_query, get_current_user_ws
 from app.models.user import User
-from app.db.database import get_db
-from app.core.cache import get_cached_data, set_cached_data
-from typing import List
-from datetime import datetime, timedelta
+from app.db.database import get_db, get_read_db
+from app.core.config import settings
+from app.utils.etag import etag_matches, make_etag, not_modified
+from app.utils.json_encoder import json_serializer
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 import json
 
 router = APIRouter()
@@ -22,13 +36,10 @@ async def subscribe_to_symbols(symbol_list: SymbolList, current_user: User = Dep
         if polygon_ws is None:
             logger.error("polygon_ws is None")
             raise HTTPException(status_code=500, detail="WebSocket not initialized")
-        
-        if polygon_ws.connection is None:
-            logger.error("polygon_ws.connection is None")
-            raise HTTPException(status_code=500, detail="WebSocket connection not established")
-        
+
+        # Demand is recorded even while disconnected; it is applied when the feed (re)connects
         logger.info(f"Attempting to subscribe to symbols: {symbol_list.symbols}")
-        await polygon_ws.subscribe(symbol_list.symbols)
+        await polygon_ws.subscribe(symbol_list.symbols, owner=_rest_owner(current_user))
         return {"message": f"Subscribed to symbols: {', '.join(symbol_list.symbols)}"}
     except Exception as e:
         logger.error(f"Error in subscribe_to_symbols: {str(e)}", exc_info=True)
@@ -37,65 +48,280 @@ async def subscribe_to_symbols(symbol_list: SymbolList, current_user: User = Dep
 @router.post("/market-data/unsubscribe")
 async def unsubscribe_from_symbols(symbols: List[str], current_user: User = Depends(get_current_user_bearer)):
     try:
-        await polygon_ws.unsubscribe(symbols)
+        await polygon_ws.unsubscribe(symbols, owner=_rest_owner(current_user))
         return {"message": f"Unsubscribed from symbols: {', '.join(symbols)}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/market-data/subscribed")
 async def get_subscribed_symbols(current_user: User = Depends(get_current_user_bearer)):
-    return {"subscribed_symbols": list(polygon_ws.subscribed_symbols)}
+    return {
+        "subscribed_symbols": sorted(polygon_ws.subscriptions.owned_by(_rest_owner(current_user))),
+        "active_symbols": sorted(polygon_ws.subscribed_symbols),
+        "connected": polygon_ws.connection is not None,
+    }
+
+def _rest_owner(user: User):
+    return ("user", user.user_id)
 
 @router.get("/market-data/historical/{symbol}")
 async def get_historical_data(
     symbol: str,
+    request: Request,
+    response: Response,
     start_date: datetime,
     end_date: datetime = None,
+    stream: bool = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, gt=0),
+    timeframe: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3),
     current_user: User = Depends(get_current_user_bearer),
-    db = Depends(get_db)
+    db = Depends(get_read_db)
 ):
+    """Bars for a symbol over a time range.
+
+    JSON by default. Send Accept: application/vnd.apache.arrow.stream (when
+    pyarrow is installed) or application/x-numpy-columns for column-oriented
+    binary built straight from the query result.
+
+    With stream=true the range is read in fixed-size chunks and written as
+    NDJSON while it is read. If limit rows were written, a final
+    {"next_cursor": ...} line resumes the range when passed back as cursor.
+
+    Ranges are assembled from per-day chunks: closed days from the on-disk
+    bar store when BAR_STORE_DIR is set, then the Redis day-chunk cache, and
+    only the remaining days from the database.
+
+    timeframe (e.g. 5m, 1h, 1d) resamples to coarser OHLCV bars, read from
+    the 1h or 1d rollup table when the timeframe is a multiple of one, and
+    max_points downsamples the result with LTTB for charting.
+
+    Responses carry a weak ETag built from the query parameters and, unless
+    the range ended before the settle window, the symbol's latest bar time;
+    a matching If-None-Match gets 304 before any bars are read.
+    """
+    if not is_valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail="Invalid symbol")
+    media_type = negotiate_format(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(available_formats())}")
+
+    open_ended = end_date is None
     if end_date is None:
         end_date = datetime.utcnow()
 
-    query = """
-    SELECT time, open, high, low, close, volume
-    FROM market_data
-    WHERE symbol = :symbol AND time BETWEEN :start_date AND :end_date
-    ORDER BY time ASC
-    """
-    results = await db.fetch_all(query, {
-        "symbol": symbol,
-        "start_date": start_date,
-        "end_date": end_date
-    })
+    timeframe_seconds = None
+    if timeframe is not None:
+        try:
+            timeframe_seconds = parse_timeframe(timeframe)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    etag = await _historical_etag(db, symbol, request, end_date, open_ended, media_type)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    validators = {"ETag": etag, "Vary": "Accept"}
+    response.headers.update(validators)
+
+    if stream:
+        if timeframe_seconds is not None or max_points is not None:
+            raise HTTPException(status_code=400, detail="timeframe and max_points cannot be combined with stream")
+        if media_type != JSON:
+            raise HTTPException(status_code=406, detail="Streaming responses are NDJSON only")
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return StreamingResponse(
+            _stream_bars_ndjson(db, symbol, start_date, end_date, after, limit),
+            media_type="application/x-ndjson",
+            headers=validators,
+        )
+
+    rollup = rollup_table_for(timeframe_seconds) if settings.ROLLUPS_ENABLED and timeframe_seconds else None
+    if rollup is not None:
+        columns = rows_to_columns(await fetch_rollup_bars(db, rollup, symbol, start_date, end_date))
+    elif bar_store is not None or day_chunk_cache is not None:
+        columns = await load_bar_columns(db, symbol, start_date, end_date, bar_store, day_chunk_cache)
+    else:
+        results = await fetch_bars(db, symbol, start_date, end_date)
+        if timeframe_seconds is None and max_points is None and media_type == JSON:
+            return [dict(row) for row in results]
+        columns = rows_to_columns(results)
 
-    return [dict(row) for row in results]
+    if timeframe_seconds is not None:
+        columns = resample_ohlcv(columns, timeframe_seconds)
+    if max_points is not None:
+        columns = downsample_lttb(columns, max_points)
+    if media_type == JSON:
+        return columns_to_records(columns)
+    return Response(content=encode_columns(columns, media_type), media_type=media_type, headers=validators)
+
+async def _historical_etag(db, symbol, request, end_date, open_ended, media_type) -> str:
+    params = sorted(request.query_params.multi_items())
+    end = end_date if end_date.tzinfo else end_date.replace(tzinfo=timezone.utc)
+    if not open_ended and end + DAY_SETTLE <= datetime.now(timezone.utc):
+        # Bars for a range this old no longer change
+        return make_etag(symbol, params, media_type)
+    latest = (await get_latest_bars(db, [symbol]))[symbol]
+    return make_etag(symbol, params, media_type, latest["time"] if latest else None)
+
+async def _stream_bars_ndjson(db, symbol, start_date, end_date, after, limit):
+    written = 0
+    last_time = None
+    async for rows in iter_bar_chunks(db, symbol, start_date, end_date, after=after,
+                                      chunk_rows=settings.HISTORICAL_CHUNK_ROWS, limit=limit):
+        yield "".join(json_serializer(dict(row)) + "\n" for row in rows)
+        written += len(rows)
+        last_time = rows[-1]["time"]
+    if limit is not None and written == limit:
+        yield json.dumps({"next_cursor": encode_cursor(last_time)}) + "\n"
+
+@router.get("/market-data/latest")
+async def get_latest_data_bulk(
+    symbols: str,
+    current_user: User = Depends(get_current_user_bearer),
+    db = Depends(get_db)
+):
+    """Latest bar for each of a comma-separated list of symbols (null where there is none).
+
+    Symbols on the live Polygon stream are answered from memory; the rest
+    come from Redis and the database.
+    """
+    symbol_list = list(dict.fromkeys(_parse_symbols(symbols)))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(symbol_list) > settings.LATEST_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail="Too many symbols")
+    return await get_latest_bars(db, symbol_list)
 
 @router.get("/market-data/latest/{symbol}")
 async def get_latest_data(
     symbol: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user_bearer),
     db = Depends(get_db)
 ):
-    cache_key = f"latest_data:{symbol}"
-    cached_data = await get_cached_data(cache_key)
-
-    if cached_data:
-        return json.loads(cached_data)
-
-    query = """
-    SELECT time, open, high, low, close, volume
-    FROM market_data
-    WHERE symbol = :symbol
-    ORDER BY time DESC
-    LIMIT 1
+    data = (await get_latest_bars(db, [symbol]))[symbol]
+    if data is None:
+        raise HTTPException(status_code=404, detail="No data found for the given symbol")
+    # The whole bar, not just its time: a live 1s bar and the stored 1m bar can share a start time
+    etag = make_etag(symbol, *(data[key] for key in BAR_KEYS))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return data
+
+def _parse_symbols(symbols: str) -> List[str]:
+    return [s.strip().upper() for s in symbols.split(",") if s.strip()]
+
+@router.websocket("/market-data/stream")
+async def stream_bars(websocket: WebSocket, current_user: User = Depends(get_current_user_ws)):
+    """Push live bars for the symbols a client subscribes to.
+
+    Clients send {"action": "subscribe" | "unsubscribe", "symbols": [...]},
+    optionally with "timeframes": ["1s", "1m", ...] to filter, and receive JSON
+    arrays of bars. Slow clients get the latest bar per symbol and timeframe.
     """
-    result = await db.fetch_one(query, {"symbol": symbol})
+    await websocket.accept()
+    subscriber = bar_broadcaster.subscribe()
 
-    if result is None:
-        raise HTTPException(status_code=404, detail="No data found for the given symbol")
+    async def send_error(message: str):
+        await websocket.send_json({"ev": "error", "message": message})
+
+    async def receive_commands():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except WebSocketDisconnect:
+                return
+            except ValueError:
+                await send_error("Invalid JSON")
+                continue
+
+            if not isinstance(message, dict):
+                await send_error("Message must be a JSON object")
+                continue
+            symbols = message.get("symbols", [])
+            if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                await send_error("symbols must be a list of strings")
+                continue
+            symbols = [s.strip().upper() for s in symbols if s.strip()]
+            timeframes = message.get("timeframes")
+            if timeframes is not None and (not isinstance(timeframes, list) or not all(isinstance(t, str) for t in timeframes)):
+                await send_error("timeframes must be a list of strings")
+                continue
+
+            action = message.get("action")
+            if action == "subscribe":
+                if len(subscriber.symbols | set(symbols)) > settings.STREAM_MAX_SYMBOLS_PER_CLIENT:
+                    await send_error("Too many symbols")
+                    continue
+                if timeframes is not None:
+                    subscriber.timeframes = set(timeframes)
+                bar_broadcaster.add_symbols(subscriber, symbols)
+                polygon_ws.subscriptions.acquire(subscriber, symbols)
+            elif action == "unsubscribe":
+                bar_broadcaster.remove_symbols(subscriber, symbols)
+                polygon_ws.subscriptions.release(subscriber, symbols)
+            else:
+                await send_error(f"Unknown action: {action}")
+                continue
+            await websocket.send_json({
+                "ev": "status",
+                "symbols": sorted(subscriber.symbols),
+                "timeframes": sorted(subscriber.timeframes) if subscriber.timeframes is not None else None,
+            })
+
+    async def send_bars():
+        while not subscriber.closed:
+            payloads = await subscriber.get()
+            if payloads:
+                await websocket.send_text(encode_batch(payloads))
+
+    # Whichever side finishes first (client gone, send failure) tears down the other
+    tasks = [asyncio.create_task(receive_commands()), asyncio.create_task(send_bars())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error(f"Error in bar stream: {str(error)}", exc_info=error)
+    finally:
+        bar_broadcaster.unsubscribe(subscriber)
+        polygon_ws.subscriptions.release_all(subscriber)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@router.get("/market-data/stream/sse")
+async def stream_bars_sse(
+    request: Request,
+    symbols: str,
+    timeframes: Optional[str] = None,
+    current_user: User = Depends(get_current_user_query)
+):
+    # EventSource cannot send an Authorization header, so this takes the token as a query parameter
+    symbol_list = _parse_symbols(symbols)
+    if len(symbol_list) > settings.STREAM_MAX_SYMBOLS_PER_CLIENT:
+        raise HTTPException(status_code=400, detail="Too many symbols")
 
-    data = dict(result)
-    await set_cached_data(cache_key, json.dumps(data), expiration=60)  # Cache for 1 minute
+    async def events():
+        subscriber = bar_broadcaster.subscribe(symbol_list, timeframes.split(",") if timeframes else None)
+        polygon_ws.subscriptions.acquire(subscriber, symbol_list)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    payloads = await asyncio.wait_for(subscriber.get(), timeout=settings.STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if payloads:
+                    yield f"data: {encode_batch(payloads)}\n\n"
+        finally:
+            bar_broadcaster.unsubscribe(subscriber)
+            polygon_ws.subscriptions.release_all(subscriber)
 
-    return data
\ No newline at end of file
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
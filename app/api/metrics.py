@@ -0,0 +1,23 @@
+# app/api/metrics.py
+from fastapi import APIRouter, Depends
+from app.api.auth import get_current_user_bearer
+from app.core.cache import cache_stats, local_cache, pool_stats
+from app.db.statements import statement_timings
+from app.models.user import User
+
+router = APIRouter()
+
+@router.get("/internal/metrics", include_in_schema=False)
+async def get_metrics(current_user: User = Depends(get_current_user_bearer)):
+    """Cache counters per key namespace, L1 occupancy, Redis pool usage and SQL statement timings, for tuning."""
+    return {
+        "cache": cache_stats(),
+        "l1": {
+            "enabled": local_cache.enabled,
+            "entries": len(local_cache),
+            "max_entries": local_cache.max_entries,
+            "evictions": local_cache.evictions,
+        },
+        "redis_pool": pool_stats(),
+        "statements": statement_timings(),
+    }
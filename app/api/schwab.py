@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer
 from app.db.database import get_db
+from app.db.statements import SCHWAB_API_KEY
 from app.models.user import User
 from app.api.auth import get_current_user
 from app.services import schwab_service
@@ -56,7 +57,7 @@ async def complete_schwab_link(
 ):
     # Retrieve the saved credentials
     credentials = await db.fetch_one(
-        "SELECT * FROM api_keys WHERE user_id = :user_id AND key_name = 'schwab'",
+        SCHWAB_API_KEY,
         {"user_id": current_user.id}
     )
 
@@ -92,7 +93,7 @@ async def get_schwab_account_status(
     db = Depends(get_db)
 ):
     credentials = await db.fetch_one(
-        "SELECT * FROM api_keys WHERE user_id = :user_id AND key_name = 'schwab'",
+        SCHWAB_API_KEY,
         {"user_id": current_user.id}
     )
 
@@ -6,6 +6,7 @@ import asyncio
 import logging
 from logging.handlers import RotatingFileHandler
 from app.db.database import get_db
+from app.db.statements import SCHWAB_API_KEY
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -135,7 +136,7 @@ class Tokens:
     async def _read_tokens(self):
         try:
             credentials = await self.db.fetch_one(
-                "SELECT * FROM api_keys WHERE user_id = :user_id AND key_name = 'schwab'",
+                SCHWAB_API_KEY,
                 {"user_id": self.user_id}
             )
             if credentials:
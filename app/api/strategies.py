@@ -1,149 +1,145 @@
 # app/api/strategies.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import TypeAdapter
 from typing import List, Dict, Any
-from app.models.strategy import Strategy, StrategyCreate, StrategyComponent
+from app.models.strategy import Strategy, StrategyCreate
 from app.db.database import get_db
+from app.db.statements import register
+from app.services.strategy_cache import get_cached_strategy, strategy_changed
 from app.api.auth import get_current_user
 from datetime import datetime, timezone
 from app.utils.json_encoder import json_serializer
+import logging
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Columns are listed rather than *, so these prepared statements keep their
+# result type when a migration adds a column
+STRATEGY_COLUMNS = "id, user_id, name, description, is_active, asset_filters, additional_config, created_at, updated_at"
+COMPONENT_COLUMNS = "id, component_type, conditions, exit_conditions, parameters"
+
+def _component_json(alias: str) -> str:
+    fields = ", ".join(f"'{column}', {alias}.{column}" for column in COMPONENT_COLUMNS.split(", "))
+    return f"json_agg(json_build_object({fields}) ORDER BY {alias}.id)"
+
+# Strategies with their components aggregated in the same query
+STRATEGY_SELECT = f"""
+SELECT {", ".join("s." + column for column in STRATEGY_COLUMNS.split(", "))}, COALESCE(c.components, '[]'::json) AS components
+FROM strategies s
+LEFT JOIN LATERAL (
+    SELECT {_component_json("sc")} AS components
+    FROM strategy_components sc
+    WHERE sc.strategy_id = s.id
+) c ON true
+"""
+
+STRATEGY_QUERY = register("strategy", STRATEGY_SELECT + "WHERE s.id = :id AND s.user_id = :user_id")
+
+# Keyset pagination on id, so deep pages cost the same as the first
+STRATEGIES_PAGE_QUERY = register("strategies_page", STRATEGY_SELECT + """
+WHERE s.user_id = :user_id AND s.id > :after_id
+ORDER BY s.id
+LIMIT :limit
+""")
+
+# Writes are single statements: the strategy row and all of its components go
+# in one round trip, atomically, however many components there are. The
+# components come back from RETURNING because the statement cannot see its own
+# inserts through STRATEGY_SELECT.
+_INSERT_COMPONENTS = f"""
+components AS (
+    INSERT INTO strategy_components (strategy_id, component_type, conditions, exit_conditions, parameters)
+    SELECT strategy.id, c.component_type, c.conditions, c.exit_conditions, c.parameters
+    FROM strategy, jsonb_to_recordset(CAST(:components AS jsonb)) AS c(
+        component_type text, conditions jsonb, exit_conditions jsonb, parameters jsonb
+    )
+    RETURNING {COMPONENT_COLUMNS}
+)
+SELECT {STRATEGY_COLUMNS}, COALESCE((SELECT {_component_json("components")} FROM components), '[]'::json) AS components
+FROM strategy
+"""
+
+CREATE_STRATEGY_QUERY = register("create_strategy", f"""
+WITH strategy AS (
+    INSERT INTO strategies (user_id, name, description, is_active, asset_filters, additional_config, created_at, updated_at)
+    VALUES (:user_id, :name, :description, :is_active, :asset_filters, :additional_config, :now, :now)
+    RETURNING {STRATEGY_COLUMNS}
+), """ + _INSERT_COMPONENTS)
+
+UPDATE_STRATEGY_QUERY = register("update_strategy", f"""
+WITH strategy AS (
+    UPDATE strategies
+    SET name = :name, description = :description, is_active = :is_active,
+        asset_filters = :asset_filters, additional_config = :additional_config, updated_at = :now
+    WHERE id = :id AND user_id = :user_id
+    RETURNING {STRATEGY_COLUMNS}
+), removed AS (
+    DELETE FROM strategy_components WHERE strategy_id IN (SELECT id FROM strategy)
+), """ + _INSERT_COMPONENTS)
+
+strategy_list = TypeAdapter(List[Strategy])
+
+def strategy_values(strategy: StrategyCreate) -> Dict[str, Any]:
+    values = strategy.model_dump()
+    return {
+        "name": values["name"],
+        "description": values["description"],
+        "is_active": values["is_active"],
+        "asset_filters": json_serializer(values["asset_filters"]),
+        "additional_config": json_serializer(values["additional_config"]),
+        "components": json_serializer(values["components"]),
+        "now": datetime.now(timezone.utc),
+    }
+
 @router.post("/strategies", response_model=Strategy)
 async def create_strategy(strategy: StrategyCreate, current_user = Depends(get_current_user), db = Depends(get_db)):
     try:
-        # Convert strategy to dict with serializable dates
-        strategy_dict = strategy.model_dump()
-        current_time = datetime.now(timezone.utc)
-        
-        # Prepare the strategy data
-        db_strategy = {
-            "name": strategy_dict['name'],
-            "description": strategy_dict['description'],
-            "is_active": strategy_dict['is_active'],
-            "user_id": current_user.user_id,
-            "asset_filters": json_serializer(strategy_dict['asset_filters']),
-            "additional_config": json_serializer(strategy_dict.get('additional_config', {})),
-            "created_at": current_time.isoformat(),
-            "updated_at": current_time.isoformat()
-        }
-        
-        # Insert strategy
-        strategy_result = db.table("strategies").insert(db_strategy).execute()
-        
-        if not strategy_result.data:
-            raise HTTPException(status_code=500, detail="Failed to create strategy")
-            
-        strategy_id = strategy_result.data[0]['id']
-        components = []
-        
-        # Insert components
-        for component in strategy_dict['components']:
-            db_component = {
-                "strategy_id": strategy_id,
-                "component_type": component['component_type'],
-                "conditions": json_serializer(component.get('conditions', [])),
-                "exit_conditions": json_serializer(component.get('exit_conditions', [])),
-                "parameters": json_serializer(component.get('parameters', {}))
-            }
-            
-            component_result = db.table("strategy_components").insert(db_component).execute()
-            if component_result.data:
-                components.append(StrategyComponent(**{
-                    **component,
-                    'id': component_result.data[0]['id']
-                }))
-        
-        # Construct the complete strategy object
-        created_strategy = Strategy(
-            id=strategy_id,
-            user_id=current_user.user_id,
-            name=strategy_dict['name'],
-            description=strategy_dict['description'],
-            is_active=strategy_dict['is_active'],
-            asset_filters=strategy_dict['asset_filters'],
-            components=components,
-            additional_config=strategy_dict.get('additional_config', {}),
-            created_at=current_time,
-            updated_at=current_time
+        created = await db.fetch_one(
+            CREATE_STRATEGY_QUERY,
+            {**strategy_values(strategy), "user_id": current_user.user_id}
         )
-        
-        return created_strategy
-        
+        return Strategy(**created)
     except Exception as e:
-        print(f"Error creating strategy: {str(e)}")
-        print(f"Strategy data: {strategy_dict}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Error creating strategy: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error creating strategy: {str(e)}")
 
 @router.get("/strategies", response_model=List[Strategy])
-async def get_strategies(current_user = Depends(get_current_user), db = Depends(get_db)):
-    strategies = await db.fetch_all(
-        "SELECT * FROM strategies WHERE user_id = :user_id",
-        {"user_id": current_user.id}
+async def get_strategies(
+    after_id: int = Query(0, ge=0, description="Return strategies with an id greater than this (the last id of the previous page)"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    rows = await db.fetch_all(
+        STRATEGIES_PAGE_QUERY,
+        {"user_id": current_user.user_id, "after_id": after_id, "limit": limit}
     )
-    
-    result = []
-    for strategy in strategies:
-        components = await db.fetch_all(
-            "SELECT * FROM strategy_components WHERE strategy_id = :strategy_id",
-            {"strategy_id": strategy['id']}
-        )
-        result.append(Strategy(**strategy, components=[StrategyComponent(**c) for c in components]))
-    
-    return result
+    return strategy_list.validate_python([dict(row) for row in rows])
 
 @router.get("/strategies/{strategy_id}", response_model=Strategy)
 async def get_strategy(strategy_id: int, current_user = Depends(get_current_user), db = Depends(get_db)):
-    strategy = await db.fetch_one(
-        "SELECT * FROM strategies WHERE id = :id AND user_id = :user_id",
-        {"id": strategy_id, "user_id": current_user.id}
-    )
+    async def load():
+        row = await db.fetch_one(STRATEGY_QUERY, {"id": strategy_id, "user_id": current_user.user_id})
+        return Strategy(**row) if row is not None else None
+
+    strategy = await get_cached_strategy(current_user.user_id, strategy_id, load)
     if strategy is None:
         raise HTTPException(status_code=404, detail="Strategy not found")
-    
-    components = await db.fetch_all(
-        "SELECT * FROM strategy_components WHERE strategy_id = :strategy_id",
-        {"strategy_id": strategy_id}
-    )
-    
-    return Strategy(**strategy, components=[StrategyComponent(**c) for c in components])
+    return strategy
 
 @router.put("/strategies/{strategy_id}", response_model=Strategy)
 async def update_strategy(strategy_id: int, strategy: StrategyCreate, current_user = Depends(get_current_user), db = Depends(get_db)):
-    existing = await get_strategy(strategy_id, current_user, db)
-    if not existing:
+    updated = await db.fetch_one(
+        UPDATE_STRATEGY_QUERY,
+        {**strategy_values(strategy), "id": strategy_id, "user_id": current_user.user_id}
+    )
+    if updated is None:
         raise HTTPException(status_code=404, detail="Strategy not found")
-
-    update_data = strategy.dict(exclude_unset=True)
-    update_data['updated_at'] = datetime.utcnow()
-
-    async with db.transaction():
-        await db.execute(
-            """
-            UPDATE strategies
-            SET name = :name, description = :description, is_active = :is_active,
-                asset_filters = :asset_filters, additional_config = :additional_config, updated_at = :updated_at
-            WHERE id = :id
-            """,
-            {**update_data, 'id': strategy_id}
-        )
-
-        # Delete existing components and insert new ones
-        await db.execute("DELETE FROM strategy_components WHERE strategy_id = :strategy_id", {"strategy_id": strategy_id})
-        
-        for component in update_data['components']:
-            await db.execute(
-                """
-                INSERT INTO strategy_components (strategy_id, component_type, conditions, exit_conditions, parameters)
-                VALUES (:strategy_id, :component_type, :conditions, :exit_conditions, :parameters)
-                """,
-                {**component.dict(), 'strategy_id': strategy_id}
-            )
-
-    return await get_strategy(strategy_id, current_user, db)
+    await strategy_changed(current_user.user_id, strategy_id)
+    return Strategy(**updated)
 
 @router.delete("/strategies/{strategy_id}")
 async def delete_strategy(strategy_id: int, current_user = Depends(get_current_user), db = Depends(get_db)):
@@ -154,6 +150,7 @@ async def delete_strategy(strategy_id: int, current_user = Depends(get_current_u
     async with db.transaction():
         await db.execute("DELETE FROM strategy_components WHERE strategy_id = :strategy_id", {"strategy_id": strategy_id})
         await db.execute("DELETE FROM strategies WHERE id = :id", {"id": strategy_id})
+    await strategy_changed(current_user.user_id, strategy_id)
 
     return {"message": "Strategy deleted successfully"}
 
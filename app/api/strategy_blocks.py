@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from app.models.strategy_block import StrategyBlock, StrategyBlockCreate
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.api.auth import get_current_user
 
 router = APIRouter()
@@ -10,7 +10,7 @@ router = APIRouter()
 @router.post("/strategy-blocks", response_model=StrategyBlock)
 async def create_strategy_block(block: StrategyBlockCreate, current_user = Depends(get_current_user), db = Depends(get_db)):
     new_block = block.dict()
-    result = await db.execute(
+    result = await db.fetch_one(
         """
         INSERT INTO strategy_blocks (name, block_type, parameters)
         VALUES (:name, :block_type, :parameters)
@@ -21,7 +21,7 @@ async def create_strategy_block(block: StrategyBlockCreate, current_user = Depen
     return StrategyBlock(**result)
 
 @router.get("/strategy-blocks", response_model=List[StrategyBlock])
-async def get_strategy_blocks(db = Depends(get_db)):
+async def get_strategy_blocks(db = Depends(get_read_db)):
     results = await db.fetch_all("SELECT * FROM strategy_blocks")
     return [StrategyBlock(**result) for result in results]
 
@@ -1,12 +1,469 @@
-import redis
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import msgpack
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError
 from app.core.config import settings
-r = redis.Redis(
-  host=settings.REDIS_HOST,
-  port=settings.REDIS_PORT,
-  password=settings.REDIS_PASSWORD)
 
-async def get_cached_data(key: str):
-    return await r.get(key)
+logger = logging.getLogger(__name__)
 
-async def set_cached_data(key: str, value: str, expiration: int = 3600):
-    await r.set(key, value, ex=expiration)
+class MeteredConnectionPool(redis.BlockingConnectionPool):
+    """Bounded pool: callers wait (up to timeout) for a free connection instead of opening more.
+
+    Counts checkouts, time spent waiting and checkouts that timed out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError as e:
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+        self.checkouts += 1
+        self.wait_seconds += time.perf_counter() - started
+        return connection
+
+pool = MeteredConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    password=settings.REDIS_PASSWORD,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+)
+r = redis.Redis(connection_pool=pool)
+
+def pool_stats() -> dict:
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+        "checkouts": pool.checkouts,
+        "wait_ms_avg": pool.wait_seconds / pool.checkouts * 1000 if pool.checkouts else 0.0,
+        "timeouts": pool.timeouts,
+    }
+
+async def close_cache():
+    await r.aclose()
+    await pool.disconnect()
+
+async def get_many(keys: List[str]) -> List[Optional[bytes]]:
+    """Values for keys in order (None for misses), in one MGET round trip."""
+    if not keys:
+        return []
+    return await r.mget(keys)
+
+async def set_many(items: Dict[str, Union[str, bytes]], expiration: Optional[int] = 3600):
+    """Set several keys with the same expiry (None: never) in one pipelined round trip."""
+    if not items:
+        return
+    async with r.pipeline(transaction=False) as pipe:
+        for key, value in items.items():
+            pipe.set(key, value, ex=expiration)
+        await pipe.execute()
+
+# Encoded values start with a one-byte tag naming how the rest is stored.
+# Entries written before the codec existed are JSON text, which never starts
+# with one of these bytes, so they still decode.
+TAG_MSGPACK = 0x01
+TAG_MSGPACK_ZLIB = 0x02
+TAG_BYTES = 0x03
+TAG_BYTES_ZLIB = 0x04
+
+def _pack_default(obj):
+    if isinstance(obj, datetime):
+        # Naive timestamps from the database are UTC
+        return msgpack.Timestamp.from_datetime(obj if obj.tzinfo else obj.replace(tzinfo=timezone.utc))
+    raise TypeError(f"Cannot cache {type(obj).__name__}")
+
+@dataclass
+class NamespaceStats:
+    """Counters for one key prefix (the part before the first ':')."""
+    l1_hits: int = 0
+    hits: int = 0
+    misses: int = 0
+    l1_evictions: int = 0
+    loads: int = 0
+    load_errors: int = 0
+    load_seconds: float = 0.0
+    bytes_read: int = 0
+    encoded: int = 0
+    decoded: int = 0
+    encode_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.l1_hits + self.hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.l1_hits + self.hits) / lookups if lookups else 0.0,
+            "l1_evictions": self.l1_evictions,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "load_ms_avg": self.load_seconds / self.loads * 1000 if self.loads else 0.0,
+            "read_bytes_avg": self.bytes_read / self.hits if self.hits else 0.0,
+            "written_bytes_avg": self.stored_bytes / self.encoded if self.encoded else 0.0,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "encode_us_avg": self.encode_seconds / self.encoded * 1e6 if self.encoded else 0.0,
+            "decode_us_avg": self.decode_seconds / self.decoded * 1e6 if self.decoded else 0.0,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0,
+        }
+
+class CacheCodec:
+    """msgpack for structured values, bytes passed through, zlib above a size threshold.
+
+    Subclass and swap in with set_codec to change the serialization.
+    """
+
+    def __init__(self, compress_threshold: int = 1024, compress_level: int = 1):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def serialize(self, value: Any):
+        """(tag, payload) before compression."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return TAG_BYTES, bytes(value)
+        return TAG_MSGPACK, msgpack.packb(value, default=_pack_default)
+
+    def frame(self, tag: int, payload: bytes) -> bytes:
+        if len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                tag, payload = tag + 1, compressed
+        return bytes((tag,)) + payload
+
+    def encode(self, value: Any) -> bytes:
+        return self.frame(*self.serialize(value))
+
+    def decode(self, data: bytes) -> Any:
+        tag = data[0]
+        if tag in (TAG_MSGPACK_ZLIB, TAG_BYTES_ZLIB):
+            payload = zlib.decompress(data[1:])
+            tag -= 1
+        else:
+            payload = data[1:]
+        if tag == TAG_MSGPACK:
+            return msgpack.unpackb(payload, timestamp=3)
+        if tag == TAG_BYTES:
+            return payload
+        # Written before the codec: JSON text, or raw bytes
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+
+codec = CacheCodec(settings.CACHE_COMPRESS_THRESHOLD_BYTES)
+_namespace_stats: Dict[str, NamespaceStats] = {}
+
+def set_codec(new_codec: CacheCodec):
+    global codec
+    codec = new_codec
+
+def key_namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+def stats_for(key: str) -> NamespaceStats:
+    namespace = key_namespace(key)
+    stats = _namespace_stats.get(namespace)
+    if stats is None:
+        stats = _namespace_stats[namespace] = NamespaceStats()
+    return stats
+
+def encode_value(key: str, value: Any) -> bytes:
+    started = time.perf_counter()
+    tag, payload = codec.serialize(value)
+    data = codec.frame(tag, payload)
+    stats = stats_for(key)
+    stats.encoded += 1
+    stats.encode_seconds += time.perf_counter() - started
+    stats.raw_bytes += len(payload)
+    stats.stored_bytes += len(data)
+    return data
+
+def decode_value(key: str, data: bytes) -> Any:
+    started = time.perf_counter()
+    value = codec.decode(data)
+    stats = stats_for(key)
+    stats.decoded += 1
+    stats.decode_seconds += time.perf_counter() - started
+    return value
+
+def cache_stats() -> Dict[str, dict]:
+    """Hits, misses, loads, payload sizes, evictions and codec cost per key namespace."""
+    return {namespace: stats.as_dict() for namespace, stats in _namespace_stats.items()}
+
+class LocalCache:
+    """In-process L1 in front of Redis: bounded, per-entry TTL, least recently used evicted first."""
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Off until the invalidation listener is subscribed, so a worker that
+        # cannot hear other workers' writes never serves from L1
+        self.enabled = False
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        """(hit, value)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            stats_for(evicted).l1_evictions += 1
+
+    def invalidate(self, keys: Iterable[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+local_cache = LocalCache(settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_TTL_SECONDS)
+L1_NAMESPACES = frozenset(n.strip() for n in settings.CACHE_L1_NAMESPACES.split(",") if n.strip())
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Lets a worker skip its own invalidation messages
+WORKER_ID = uuid.uuid4().hex
+
+def uses_local_cache(key: str) -> bool:
+    return key_namespace(key) in L1_NAMESPACES
+
+async def get_many_values(keys: List[str]) -> List[Any]:
+    """Decoded values for keys in order, None for misses. L1 first, then one MGET."""
+    values = [None] * len(keys)
+    remote = []
+    for i, key in enumerate(keys):
+        hit, value = local_cache.get(key) if uses_local_cache(key) else (False, None)
+        if hit:
+            values[i] = value
+            stats_for(key).l1_hits += 1
+        else:
+            remote.append(i)
+    if remote:
+        remote_keys = [keys[i] for i in remote]
+        l1_keys = [key for key in remote_keys if uses_local_cache(key)] if local_cache.enabled else []
+        fetched, remaining = await _get_many_with_ttls(remote_keys, l1_keys)
+        for i, data in zip(remote, fetched):
+            stats = stats_for(keys[i])
+            if data is None:
+                stats.misses += 1
+            else:
+                stats.hits += 1
+                stats.bytes_read += len(data)
+                values[i] = decode_value(keys[i], data)
+                ttl = remaining.get(keys[i])
+                # Never keep a copy in L1 past the moment Redis drops the key
+                if ttl is not None and ttl != -2:
+                    local_cache.set(keys[i], values[i], None if ttl == -1 else ttl / 1000)
+    return values
+
+async def _get_many_with_ttls(keys: List[str], ttl_keys: List[str]):
+    """MGET keys, plus the PTTL (ms; -1 no expiry, -2 gone) of ttl_keys in the same round trip."""
+    if not ttl_keys:
+        return await get_many(keys), {}
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.mget(keys)
+        for key in ttl_keys:
+            pipe.pttl(key)
+        results = await pipe.execute()
+    return results[0], dict(zip(ttl_keys, results[1:]))
+
+async def set_many_values(items: Dict[str, Any], expiration: Optional[int] = 3600):
+    await set_many({key: encode_value(key, value) for key, value in items.items()}, expiration=expiration)
+    local_keys = [key for key in items if uses_local_cache(key)]
+    for key in local_keys:
+        local_cache.set(key, items[key], expiration)
+    await _publish_invalidation(local_keys)
+
+async def invalidate(keys: List[str]):
+    """Drop keys from Redis and from every worker's L1."""
+    if not keys:
+        return
+    await r.delete(*keys)
+    local_cache.invalidate(keys)
+    await _publish_invalidation([key for key in keys if uses_local_cache(key)])
+
+async def _publish_invalidation(keys: List[str]):
+    if keys:
+        await r.publish(INVALIDATION_CHANNEL, "\n".join([WORKER_ID] + keys))
+
+def handle_invalidation(data: bytes):
+    sender, *keys = data.decode("utf-8").split("\n")
+    if sender != WORKER_ID:
+        local_cache.invalidate(keys)
+
+async def run_invalidation_listener(retry_seconds: float = 1.0):
+    """Drop keys other workers changed from this worker's L1; runs for the app's lifetime.
+
+    L1 is only enabled while subscribed. Each (re)subscribe starts from an
+    empty L1, since messages may have been missed while disconnected.
+    """
+    while True:
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            local_cache.clear()
+            local_cache.enabled = True
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    handle_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+        finally:
+            local_cache.enabled = False
+            local_cache.clear()
+            await pubsub.aclose()
+        await asyncio.sleep(retry_seconds)
+
+# Single-flight loading: concurrent misses for a key share one loader call.
+# Values written this way are wrapped with the load time and expiry so hits
+# can refresh early (XFetch: the closer to expiry and the slower the load,
+# the likelier), before a crowd of requests misses at once.
+_in_flight: Dict[str, asyncio.Future] = {}
+_background: set = set()
+ENVELOPE = "_sf"
+
+def _wrap(value: Any, delta: float, expires: Optional[float]) -> dict:
+    return {ENVELOPE: 1, "value": value, "delta": delta, "expires": expires}
+
+def _unwrap(entry: Any):
+    """(value, delta, expires); entries not written by get_many_or_load never refresh early."""
+    if isinstance(entry, dict) and entry.get(ENVELOPE) == 1:
+        return entry["value"], entry["delta"], entry["expires"]
+    return entry, 0.0, None
+
+def _should_refresh_early(delta: float, expires: Optional[float], beta: float) -> bool:
+    if expires is None or beta <= 0:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires
+
+async def _load(keys: List[str], load_many: Callable[[List[str]], Awaitable[Dict[str, Any]]], expiration: Optional[int]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    futures = {key: loop.create_future() for key in keys}
+    _in_flight.update(futures)
+    try:
+        started = time.perf_counter()
+        try:
+            loaded = await load_many(keys)
+        except Exception:
+            stats_for(keys[0]).load_errors += 1
+            raise
+        delta = time.perf_counter() - started
+        # One load call per batch; keys in a batch share a namespace in practice
+        stats = stats_for(keys[0])
+        stats.loads += 1
+        stats.load_seconds += delta
+        expires = time.time() + expiration if expiration else None
+        try:
+            await set_many_values(
+                {key: _wrap(value, delta, expires) for key, value in loaded.items() if value is not None},
+                expiration=expiration,
+            )
+        except RedisError as e:
+            logger.warning(f"Could not cache loaded values: {e}")
+        for key, future in futures.items():
+            future.set_result(loaded.get(key))
+        return loaded
+    except BaseException as e:
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(e)
+                # Waiters re-raise it; nobody waiting is not an error
+                future.exception()
+        raise
+    finally:
+        for key, future in futures.items():
+            if _in_flight.get(key) is future:
+                del _in_flight[key]
+
+async def get_many_or_load(
+    keys: List[str],
+    load_many: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+    expiration: Optional[int] = 3600,
+    early_refresh_beta: float = settings.CACHE_EARLY_REFRESH_BETA,
+) -> List[Any]:
+    """Cached values for keys, calling load_many once for the misses no one else is already loading.
+
+    load_many gets the missing keys and returns {key: value}; keys it leaves
+    out (or maps to None) come back as None and are not cached.
+    """
+    entries = await get_many_values(keys)
+    values = {}
+    missing = []
+    stale = []
+    for key, entry in zip(keys, entries):
+        if entry is None:
+            missing.append(key)
+            continue
+        value, delta, expires = _unwrap(entry)
+        values[key] = value
+        if _should_refresh_early(delta, expires, early_refresh_beta) and key not in _in_flight:
+            stale.append(key)
+
+    if stale:
+        task = asyncio.create_task(_load(stale, load_many, expiration))
+        _background.add(task)
+        task.add_done_callback(_finish_background_load)
+
+    waiting = {key: _in_flight[key] for key in missing if key in _in_flight}
+    own = [key for key in missing if key not in waiting]
+    if own:
+        values.update(await _load(own, load_many, expiration))
+    for key, future in waiting.items():
+        # Shielded so one cancelled request does not cancel the shared load
+        values[key] = await asyncio.shield(future)
+    return [values.get(key) for key in keys]
+
+def _finish_background_load(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Early cache refresh failed: {task.exception()}")
+
+async def get_or_load(key: str, load: Callable[[], Awaitable[Any]], expiration: Optional[int] = 3600) -> Any:
+    async def load_one(keys):
+        return {key: await load()}
+    return (await get_many_or_load([key], load_one, expiration))[0]
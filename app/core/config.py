@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 print("Entering config.py")
 
@@ -10,10 +10,25 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: str = "http://localhost:3000"
     
     DATABASE_URL: str
+    # Optional read replica for heavy read-only paths (get_read_db); unset means the primary serves them
+    DATABASE_READ_URL: Optional[str] = None
+    DATABASE_POOL_MIN_SIZE: int = 2
+    DATABASE_POOL_MAX_SIZE: int = 10
+    DATABASE_COMMAND_TIMEOUT_SECONDS: float = 30
+    # asyncpg's prepared statement cache; set to 0 behind a transaction-mode pgbouncer
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
     SUPABASE_URL: str
     SUPABASE_KEY: str
     
     POLYGON_API_KEY: str
+    POLYGON_STREAM_ENABLED: bool = False
+    POLYGON_SUBSCRIBE_DEBOUNCE_SECONDS: float = 0.25
+    POLYGON_UNSUBSCRIBE_LINGER_SECONDS: float = 30
+    BAR_TIMEFRAMES: str = "1m,5m,15m,1h"
+
+    POLYGON_RECORD_DIR: Optional[str] = None
+    POLYGON_RECORD_SEGMENT_MB: int = 256
+    POLYGON_RECORD_SEGMENT_SECONDS: int = 3600
 
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
@@ -22,6 +37,30 @@ class Settings(BaseSettings):
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5
+    CACHE_COMPRESS_THRESHOLD_BYTES: int = 1024
+    # In-process cache in front of Redis, for the listed key namespaces only
+    CACHE_L1_NAMESPACES: str = "latest_data"
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_TTL_SECONDS: float = 5
+    # XFetch beta for get_many_or_load; 0 disables early refresh
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+
+    STREAM_MAX_SYMBOLS_PER_CLIENT: int = 200
+    STREAM_KEEPALIVE_SECONDS: int = 15
+
+    HISTORICAL_CHUNK_ROWS: int = 5000
+    BAR_STORE_DIR: Optional[str] = None
+    HISTORICAL_CACHE_ENABLED: bool = True
+    HISTORICAL_OPEN_DAY_CACHE_SECONDS: int = 3600
+    # Both need app/db/rollups.sql applied
+    MARKET_DATA_WRITER_ENABLED: bool = False
+    ROLLUPS_ENABLED: bool = False
+    LATEST_MAX_SYMBOLS: int = 200
+    LATEST_LIVE_MAX_AGE_SECONDS: float = 60
+    # How long a user row stays cached for token checks; a deleted user keeps access this long
+    CURRENT_USER_CACHE_SECONDS: int = 60
 
     class Config:
         env_file = ".env"
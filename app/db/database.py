@@ -1,11 +1,215 @@
 # app/db/database.py
+import json
+import logging
+import re
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import asyncpg
+from fastapi import Depends
 from supabase import create_client, Client
 from app.core.config import settings
-from functools import lru_cache
+from app.db.statements import STATEMENTS, Statement, timed
+from app.utils.json_encoder import json_serializer
+
+logger = logging.getLogger(__name__)
 
 supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
 @lru_cache()
-def get_db():
+def get_supabase():
     supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-    return supabase
\ No newline at end of file
+    return supabase
+
+# :name placeholders, but not ::casts or colons inside words ('09:30', 'HH24:MI')
+_PARAMETER = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+@lru_cache(maxsize=1024)
+def compile_query(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """Rewrite :name placeholders to asyncpg's $n, once per query string.
+
+    Returns the SQL and the parameter names in $n order; a name used twice
+    binds to the same $n.
+    """
+    names: List[str] = []
+
+    def replace(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAMETER.sub(replace, query), tuple(names)
+
+def _bind(query: str, values: Optional[Dict[str, Any]]) -> Tuple[str, list]:
+    sql, names = compile_query(query)
+    values = values or {}
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f"Missing query parameters: {', '.join(missing)}")
+    return sql, [values[name] for name in names]
+
+def _encode_json(value: Any) -> str:
+    # Callers pass either Python objects or text they already serialized
+    return value if isinstance(value, str) else json_serializer(value)
+
+class Database:
+    """asyncpg pool behind the fetch_one / fetch_all / execute / transaction() interface.
+
+    Queries use :name placeholders with a dict of values. Inside
+    `async with db.transaction():` every call in the same task runs on the
+    transaction's connection; nested transactions become savepoints.
+    Registered statements (app/db/statements.py) are prepared on each pooled
+    connection and timed. With a fallback, calls outside a transaction that
+    cannot reach this database are retried there.
+    """
+
+    def __init__(self, url: str, min_size: int = 2, max_size: int = 10, command_timeout: float = 30, statement_cache_size: int = 100,
+                 fallback: Optional["Database"] = None):
+        self.url = url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.fallback = fallback
+        self.pool: Optional[asyncpg.Pool] = None
+        self._connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar(f"db_connection_{id(self)}", default=None)
+        # Prepared statements per connection, keyed by backend pid (unique among live connections)
+        self._prepared: Dict[int, Dict[str, asyncpg.prepared_stmt.PreparedStatement]] = {}
+
+    async def connect(self):
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                self.url,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                command_timeout=self.command_timeout,
+                statement_cache_size=self.statement_cache_size,
+                init=self._init_connection,
+            )
+
+    async def disconnect(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        self._prepared.clear()
+
+    async def _init_connection(self, connection: asyncpg.Connection):
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(type_name, encoder=_encode_json, decoder=json.loads, schema="pg_catalog")
+        pid = connection.get_server_pid()
+        self._prepared[pid] = {}
+        connection.add_termination_listener(lambda _: self._prepared.pop(pid, None))
+        for statement in STATEMENTS.values():
+            try:
+                await self._prepare(connection, statement)
+            except asyncpg.PostgresError as e:
+                # e.g. a table from an optional migration; plain queries will report it if used
+                logger.warning(f"Could not prepare statement {statement.name}: {e}")
+
+    async def _prepare(self, connection, statement: Statement):
+        prepared = self._prepared.setdefault(connection.get_server_pid(), {})
+        if statement.name not in prepared:
+            prepared[statement.name] = await connection.prepare(compile_query(statement)[0])
+        return prepared[statement.name]
+
+    async def _run(self, method: str, query: str, values: Optional[Dict[str, Any]]):
+        try:
+            return await self._run_here(method, query, values)
+        except (OSError, asyncpg.CannotConnectNowError, asyncpg.ConnectionDoesNotExistError, asyncpg.InterfaceError) as e:
+            if self.fallback is None or self._connection.get() is not None:
+                raise
+            logger.warning(f"Database unavailable, using the fallback: {e}")
+            return await self.fallback._run(method, query, values)
+
+    async def _run_here(self, method: str, query: str, values: Optional[Dict[str, Any]]):
+        sql, args = _bind(query, values)
+        async with self.connection() as connection:
+            if not isinstance(query, Statement):
+                return await getattr(connection, method)(sql, *args)
+            with timed(query):
+                try:
+                    return await self._run_prepared(connection, method, query, args)
+                except (asyncpg.InvalidCachedStatementError, asyncpg.OutdatedSchemaCacheError) as e:
+                    # The schema changed under the prepared plan. Unlike its own
+                    # statement cache, asyncpg does not re-prepare these for us.
+                    self._prepared.get(connection.get_server_pid(), {}).pop(query.name, None)
+                    if connection.is_in_transaction():
+                        # The transaction is aborted; the caller has to retry it
+                        raise
+                    logger.info(f"Re-preparing statement {query.name}: {e}")
+                    return await self._run_prepared(connection, method, query, args)
+
+    async def _run_prepared(self, connection, method: str, statement: Statement, args: list):
+        prepared = await self._prepare(connection, statement)
+        if method == "execute":
+            await prepared.fetch(*args)
+            return prepared.get_statusmsg()
+        return await getattr(prepared, method)(*args)
+
+    @asynccontextmanager
+    async def connection(self):
+        current = self._connection.get()
+        if current is not None:
+            yield current
+            return
+        if self.pool is None:
+            raise RuntimeError("Database pool is not open")
+        async with self.pool.acquire() as connection:
+            yield connection
+
+    async def fetch_one(self, query: str, values: Optional[Dict[str, Any]] = None) -> Optional[asyncpg.Record]:
+        return await self._run("fetchrow", query, values)
+
+    async def fetch_all(self, query: str, values: Optional[Dict[str, Any]] = None) -> List[asyncpg.Record]:
+        return await self._run("fetch", query, values)
+
+    async def execute(self, query: str, values: Optional[Dict[str, Any]] = None) -> int:
+        """Run a statement; returns the number of rows it affected. Use fetch_one for RETURNING."""
+        status = await self._run("execute", query, values)
+        count = status.rsplit(" ", 1)[-1]
+        return int(count) if count.isdigit() else 0
+
+    @asynccontextmanager
+    async def transaction(self):
+        current = self._connection.get()
+        if current is not None:
+            async with current.transaction():
+                yield
+            return
+        async with self.connection() as connection:
+            token = self._connection.set(connection)
+            try:
+                async with connection.transaction():
+                    yield
+            finally:
+                self._connection.reset(token)
+
+database = Database(
+    settings.DATABASE_URL,
+    min_size=settings.DATABASE_POOL_MIN_SIZE,
+    max_size=settings.DATABASE_POOL_MAX_SIZE,
+    command_timeout=settings.DATABASE_COMMAND_TIMEOUT_SECONDS,
+    statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+)
+
+# Read replica for heavy read-only paths. Replication lag means it may trail
+# the primary, so reads that must see a write the caller just made stay on get_db.
+read_database = Database(
+    settings.DATABASE_READ_URL,
+    min_size=settings.DATABASE_POOL_MIN_SIZE,
+    max_size=settings.DATABASE_POOL_MAX_SIZE,
+    command_timeout=settings.DATABASE_COMMAND_TIMEOUT_SECONDS,
+    statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+    fallback=database,
+) if settings.DATABASE_READ_URL else None
+
+def get_db():
+    return database
+
+def get_read_db(db = Depends(get_db)):
+    # Falls back to the primary when no replica is configured or its pool did not open
+    if read_database is not None and read_database.pool is not None:
+        return read_database
+    return db
@@ -0,0 +1,59 @@
+-- app/db/rollups.sql
+-- 1h and 1d rollups of market_data, kept up to date by MarketDataWriter
+-- (app/services/market_data_writer.py) as minute bars are written.
+-- Buckets match app/services/resampling.py: hours are aligned to the start of
+-- each trading session (04:00, 09:30, 16:00 ET), days to Eastern midnight.
+
+CREATE UNIQUE INDEX IF NOT EXISTS market_data_symbol_time_key ON market_data (symbol, time);
+
+CREATE OR REPLACE FUNCTION market_hour_bucket(ts timestamptz) RETURNS timestamptz
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT (session_start + floor(extract(epoch FROM local - session_start) / 3600) * interval '1 hour')
+           AT TIME ZONE 'America/New_York'
+    FROM (
+        SELECT local, date_trunc('day', local) + CASE
+                   WHEN local::time >= time '16:00' THEN interval '16 hours'
+                   WHEN local::time >= time '09:30' THEN interval '9 hours 30 minutes'
+                   WHEN local::time >= time '04:00' THEN interval '4 hours'
+                   ELSE interval '0'
+               END AS session_start
+        FROM (SELECT ts AT TIME ZONE 'America/New_York' AS local) l
+    ) s
+$$;
+
+CREATE OR REPLACE FUNCTION market_day_bucket(ts timestamptz) RETURNS timestamptz
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT date_trunc('day', ts AT TIME ZONE 'America/New_York') AT TIME ZONE 'America/New_York'
+$$;
+
+-- first_time/last_time record which minute the open and close came from, so
+-- bars arriving out of order still update the rollup correctly.
+CREATE TABLE IF NOT EXISTS market_data_1h (
+    symbol text NOT NULL,
+    time timestamptz NOT NULL,
+    open double precision NOT NULL,
+    high double precision NOT NULL,
+    low double precision NOT NULL,
+    close double precision NOT NULL,
+    volume double precision NOT NULL,
+    first_time timestamptz NOT NULL,
+    last_time timestamptz NOT NULL,
+    PRIMARY KEY (symbol, time)
+);
+
+CREATE TABLE IF NOT EXISTS market_data_1d (LIKE market_data_1h INCLUDING ALL);
+
+-- One-off backfill from the minute bars already stored
+INSERT INTO market_data_1h (symbol, time, open, high, low, close, volume, first_time, last_time)
+SELECT symbol, market_hour_bucket(time), (array_agg(open ORDER BY time))[1], max(high), min(low),
+       (array_agg(close ORDER BY time DESC))[1], sum(volume), min(time), max(time)
+FROM market_data
+GROUP BY 1, 2
+ON CONFLICT (symbol, time) DO NOTHING;
+
+INSERT INTO market_data_1d (symbol, time, open, high, low, close, volume, first_time, last_time)
+SELECT symbol, market_day_bucket(time), (array_agg(open ORDER BY time))[1], max(high), min(low),
+       (array_agg(close ORDER BY time DESC))[1], sum(volume), min(time), max(time)
+FROM market_data
+GROUP BY 1, 2
+ON CONFLICT (symbol, time) DO NOTHING;
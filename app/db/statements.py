@@ -0,0 +1,79 @@
+# app/db/statements.py
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+class Statement(str):
+    """SQL text with a registry name.
+
+    Database prepares registered statements once on every pooled connection
+    and reuses them, instead of going through asyncpg's per-connection LRU
+    where ad-hoc queries can evict them. It is still a str, so anything that
+    takes a query string takes a Statement.
+    """
+
+    name: str
+
+    def __new__(cls, name: str, query: str):
+        statement = super().__new__(cls, query)
+        statement.name = name
+        return statement
+
+STATEMENTS: Dict[str, Statement] = {}
+
+def register(name: str, query: str) -> Statement:
+    existing = STATEMENTS.get(name)
+    if existing is not None and existing != query:
+        raise ValueError(f"Statement {name} is already registered with different SQL")
+    STATEMENTS[name] = Statement(name, query)
+    return STATEMENTS[name]
+
+@dataclass
+class StatementTimings:
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["mean_seconds"] = self.total_seconds / self.calls if self.calls else 0.0
+        return stats
+
+_timings: Dict[str, StatementTimings] = {}
+
+@contextmanager
+def timed(statement: Statement):
+    stats = _timings.setdefault(statement.name, StatementTimings())
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.calls += 1
+        stats.total_seconds += elapsed
+        stats.max_seconds = max(stats.max_seconds, elapsed)
+
+def statement_timings() -> Dict[str, dict]:
+    """Timings per registered statement, slowest mean first."""
+    stats = {name: t.as_dict() for name, t in _timings.items()}
+    return dict(sorted(stats.items(), key=lambda item: item[1]["mean_seconds"], reverse=True))
+
+# Shared by several modules; statements used in one place are registered there.
+# Registered statements name their columns: a prepared SELECT * fails once a
+# migration adds a column, until it is re-prepared.
+USER_COLUMNS = "user_id, username, email, created_at, last_login"
+
+USER_BY_USERNAME = register("user_by_username", f"SELECT {USER_COLUMNS} FROM users WHERE username = :username")
+
+USER_BY_ID = register("user_by_id", f"SELECT {USER_COLUMNS} FROM users WHERE user_id = :user_id")
+
+SCHWAB_API_KEY = register(
+    "schwab_api_key",
+    "SELECT user_id, key_name, api_key, api_secret, access_token, refresh_token, last_used, created_at "
+    "FROM api_keys WHERE user_id = :user_id AND key_name = 'schwab'",
+)
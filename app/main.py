@@ -1,10 +1,56 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from app.api import auth, strategies, market_data, schwab, indicators
+from app.api import auth, strategies, market_data, schwab, indicators, metrics
+from app.core.cache import close_cache, run_invalidation_listener
 from app.core.config import settings
+from app.db.database import database, read_database
 from app.services.polygon_service import initialize_polygon_websocket, run_polygon_websocket, shutdown_polygon_websocket
+from contextlib import asynccontextmanager
 import asyncio
+import asyncpg
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _log_stream_exit(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Polygon stream stopped", exc_info=task.exception())
+
+# Each uvicorn worker that runs this opens its own upstream Polygon connection,
+# and Polygon limits concurrent connections per key. POLYGON_STREAM_ENABLED is
+# off by default; enable it on a single worker (or a single-worker deployment).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.connect()
+    if read_database is not None:
+        try:
+            await read_database.connect()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(f"Read replica unavailable, reads will use the primary: {e}")
+    invalidation_task = asyncio.create_task(run_invalidation_listener())
+    stream_task = None
+    if settings.POLYGON_STREAM_ENABLED:
+        await initialize_polygon_websocket()
+        stream_task = asyncio.create_task(run_polygon_websocket())
+        stream_task.add_done_callback(_log_stream_exit)
+    yield
+    if stream_task is not None:
+        stream_task.cancel()
+        try:
+            await stream_task
+        except asyncio.CancelledError:
+            pass
+        await shutdown_polygon_websocket()
+    invalidation_task.cancel()
+    try:
+        await invalidation_task
+    except asyncio.CancelledError:
+        pass
+    await close_cache()
+    if read_database is not None:
+        await read_database.disconnect()
+    await database.disconnect()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -12,6 +58,7 @@ app = FastAPI(
     openapi_url="/api/v1/openapi.json",
     docs_url="/api/v1/docs",
     redoc_url="/api/v1/redoc",
+    lifespan=lifespan,
 )
 
 security = HTTPBearer()
@@ -31,16 +78,7 @@ app.include_router(strategies.router, prefix="/api/v1", tags=["strategies"])
 app.include_router(market_data.router, prefix="/api/v1", tags=["market_data"])
 app.include_router(schwab.router, prefix="/api/v1", tags=["schwab"])
 app.include_router(indicators.router, prefix="/api/v1", tags=["indicators"])
-
-def lifespan(app: FastAPI):
-    async def startup_event():
-        await initialize_polygon_websocket()
-        asyncio.create_task(run_polygon_websocket())
-
-    async def shutdown_event():
-        await shutdown_polygon_websocket()
-
-    return startup_event, shutdown_event
+app.include_router(metrics.router, prefix="/api/v1", tags=["internal"])
 
 @app.get("/")
 async def root():
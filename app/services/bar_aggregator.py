@@ -0,0 +1,175 @@
+# app/services/bar_aggregator.py
+import logging
+import re
+import time
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+# (start, end) of the pre-market, regular and after-hours sessions, Eastern time
+SESSIONS = [
+    ((4, 0), (9, 30)),
+    ((9, 30), (16, 0)),
+    ((16, 0), (20, 0)),
+]
+
+DEFAULT_TIMEFRAMES = ("1m", "5m", "15m", "1h")
+
+_TIMEFRAME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_timeframe(timeframe: str) -> int:
+    """Return the length of a timeframe such as '30s', '5m', '1h' or '1d' in seconds."""
+    match = re.fullmatch(r"(\d+)([smhd])", timeframe.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+    return int(match.group(1)) * _TIMEFRAME_UNITS[match.group(2)]
+
+def session_bounds(timestamp_ms: int) -> Optional[Tuple[int, int]]:
+    """Return the (start, end) in epoch ms of the session containing timestamp_ms."""
+    local = datetime.fromtimestamp(timestamp_ms / 1000, tz=MARKET_TZ)
+    for start, end in _sessions_for_day(local.date()):
+        if start <= timestamp_ms < end:
+            return start, end
+    return None
+
+_session_cache: Dict[date, List[Tuple[int, int]]] = {}
+
+def _sessions_for_day(day: date) -> List[Tuple[int, int]]:
+    sessions = _session_cache.get(day)
+    if sessions is None:
+        sessions = []
+        for (start_h, start_m), (end_h, end_m) in SESSIONS:
+            start = datetime(day.year, day.month, day.day, start_h, start_m, tzinfo=MARKET_TZ)
+            end = datetime(day.year, day.month, day.day, end_h, end_m, tzinfo=MARKET_TZ)
+            sessions.append((int(start.timestamp() * 1000), int(end.timestamp() * 1000)))
+        if len(_session_cache) > 64:
+            _session_cache.clear()
+        _session_cache[day] = sessions
+    return sessions
+
+class _OpenBar:
+    __slots__ = ("start", "end", "open", "high", "low", "close", "volume")
+
+    def __init__(self, start, end, agg):
+        self.start = start
+        self.end = end
+        self.open = agg.open
+        self.high = agg.high
+        self.low = agg.low
+        self.close = agg.close
+        self.volume = agg.volume or 0
+
+    def update(self, agg):
+        self.high = max(self.high, agg.high)
+        self.low = min(self.low, agg.low)
+        self.close = agg.close
+        self.volume += agg.volume or 0
+
+class BarAggregator:
+    """Rolls per-second aggregates into higher timeframes as they arrive.
+
+    Buckets are aligned to the start of the trading session they fall in and
+    never span a session boundary, so the last bar of a session may be short.
+    Bars are closed on event time: when a later aggregate moves past them, or
+    when the stream clock (advanced by wall time while idle) passes their end.
+    Aggregates for a bar that has already closed are dropped and counted in
+    late. Aggregates outside the extended-hours sessions are ignored.
+    """
+
+    def __init__(self, timeframes: Iterable[str] = DEFAULT_TIMEFRAMES):
+        self.timeframes = [(label, parse_timeframe(label) * 1000) for label in timeframes]
+        self.late = 0
+        self._open: Dict[Tuple[str, str], _OpenBar] = {}
+        # End of the last bar closed per (symbol, timeframe). The watermark is
+        # shared by all symbols, so a bucket can close before every symbol has
+        # sent its aggregates; anything that arrives for it afterwards is late.
+        self._closed_until: Dict[Tuple[str, str], int] = {}
+        self._listeners: List[Callable[[dict], None]] = []
+        self._watermark = 0
+        self._watermark_seen_at = time.monotonic()
+        # Earliest end among open bars, so most updates skip the flush scan
+        self._next_end = None
+
+    def on_close(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    def update(self, agg) -> List[dict]:
+        """Fold one EquityAgg into every timeframe and return the bars it closed."""
+        if agg.start_timestamp is None or agg.close is None:
+            return []
+        closed = []
+        ts = agg.start_timestamp
+        session = session_bounds(ts)
+        if session is not None:
+            session_start, session_end = session
+            for label, length in self.timeframes:
+                key = (agg.symbol, label)
+                bar = self._open.get(key)
+                if ts < self._closed_until.get(key, 0) or (bar is not None and ts < bar.start):
+                    self.late += 1
+                    continue
+                if bar is not None and ts < bar.end:
+                    bar.update(agg)
+                    continue
+                if bar is not None:
+                    closed.append(self._close(key, bar))
+                start = session_start + (ts - session_start) // length * length
+                end = min(start + length, session_end)
+                self._open[key] = _OpenBar(start, end, agg)
+                if self._next_end is None or end < self._next_end:
+                    self._next_end = end
+
+        if ts > self._watermark:
+            self._watermark = ts
+            self._watermark_seen_at = time.monotonic()
+            closed.extend(self.flush(ts))
+        return closed
+
+    def flush(self, until_ms: int) -> List[dict]:
+        """Close every open bar that ends at or before until_ms."""
+        if self._next_end is None or until_ms < self._next_end:
+            return []
+        closed = []
+        next_end = None
+        for key, bar in list(self._open.items()):
+            if bar.end <= until_ms:
+                closed.append(self._close(key, bar))
+            elif next_end is None or bar.end < next_end:
+                next_end = bar.end
+        self._next_end = next_end
+        return closed
+
+    def advance_clock(self) -> List[dict]:
+        """Move the stream clock forward by the wall time since the last aggregate.
+
+        Tracking event time rather than wall time keeps this correct on the
+        delayed feed; advancing it while idle closes the last bars of a session.
+        """
+        elapsed = int((time.monotonic() - self._watermark_seen_at) * 1000)
+        if not self._watermark:
+            return []
+        return self.flush(self._watermark + elapsed)
+
+    def _close(self, key: Tuple[str, str], bar: _OpenBar) -> dict:
+        del self._open[key]
+        self._closed_until[key] = bar.end
+        closed = {
+            "symbol": key[0],
+            "timeframe": key[1],
+            "time": datetime.fromtimestamp(bar.start / 1000, tz=timezone.utc),
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            "volume": bar.volume,
+        }
+        for listener in self._listeners:
+            try:
+                listener(closed)
+            except Exception as e:
+                logger.error(f"Error in closed-bar listener: {e}", exc_info=True)
+        return closed
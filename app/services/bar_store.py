@@ -0,0 +1,166 @@
+# app/services/bar_store.py
+import logging
+import os
+import re
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.utils.columnar import BAR_FIELDS, to_epoch_ns
+
+logger = logging.getLogger(__name__)
+
+NS_PER_DAY = 86400 * 1_000_000_000
+
+# How long after UTC midnight a day counts as closed; covers the delayed feed
+DAY_SETTLE = timedelta(hours=1)
+
+# Symbols name directories here and keys in Redis, so only ticker-like names are accepted
+SYMBOL_PATTERN = re.compile(r"[A-Z0-9.\-]{1,12}")
+
+def is_valid_symbol(symbol: str) -> bool:
+    return bool(SYMBOL_PATTERN.fullmatch(symbol.upper())) and symbol.strip(".") != ""
+
+BAR_DTYPE = np.dtype([(field, "<i8" if field == "time" else "<f8") for field in BAR_FIELDS])
+
+def day_start_ns(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+
+def days_between(start_ns: int, end_ns: int) -> List[date]:
+    """UTC days touched by [start_ns, end_ns]."""
+    first = datetime.fromtimestamp(start_ns // NS_PER_DAY * 86400, tz=timezone.utc).date()
+    last = datetime.fromtimestamp(end_ns // NS_PER_DAY * 86400, tz=timezone.utc).date()
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+def is_day_closed(day: date, now: Optional[datetime] = None, settle: timedelta = DAY_SETTLE) -> bool:
+    now = now or datetime.now(timezone.utc)
+    day_end = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1)
+    return now >= day_end + settle
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    return {field: np.empty(0, dtype=BAR_DTYPE[field]) for field in BAR_FIELDS}
+
+class BarStore:
+    """Per-symbol, per-UTC-day bar files, memory-mapped on read.
+
+    Only closed days are stored, so files are immutable once written: reads
+    are an mmap plus a binary search on time, with no copy for single-day
+    ranges. Days with no bars are stored as empty files so they are not
+    re-queried.
+    """
+
+    def __init__(self, root: str, settle: timedelta = DAY_SETTLE):
+        self.root = root
+        self.settle = settle
+        os.makedirs(root, exist_ok=True)
+
+    def is_closed(self, day: date, now: Optional[datetime] = None) -> bool:
+        return is_day_closed(day, now, self.settle)
+
+    def path(self, symbol: str, day: date) -> str:
+        if not is_valid_symbol(symbol):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        return os.path.join(self.root, symbol.upper(), f"{day.isoformat()}.npy")
+
+    def has_day(self, symbol: str, day: date) -> bool:
+        return os.path.exists(self.path(symbol, day))
+
+    def read_day(self, symbol: str, day: date) -> Optional[np.ndarray]:
+        try:
+            return np.load(self.path(symbol, day), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # mmap refuses zero-length data; empty days are small enough to load
+            return np.load(self.path(symbol, day))
+
+    def write_day(self, symbol: str, day: date, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        records = np.empty(len(columns["time"]), dtype=BAR_DTYPE)
+        for field in BAR_FIELDS:
+            records[field] = columns[field]
+        records.sort(order="time")
+        directory = os.path.dirname(self.path(symbol, day))
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so readers never map a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, records)
+            os.replace(tmp_path, self.path(symbol, day))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return records
+
+def slice_range(bars, start_ns: int, end_ns: int) -> Dict[str, np.ndarray]:
+    """Rows of time-sorted bars (a record array or columns) within [start_ns, end_ns], without copying."""
+    times = bars["time"]
+    lo = np.searchsorted(times, start_ns, side="left")
+    hi = np.searchsorted(times, end_ns, side="right")
+    return {field: bars[field][lo:hi] for field in BAR_FIELDS}
+
+def split_by_day(columns: Dict[str, np.ndarray], days: List[date]) -> Dict[date, Dict[str, np.ndarray]]:
+    """Split time-sorted columns into one set per UTC day; days without rows get empty columns."""
+    result = {}
+    times = columns["time"]
+    for day in days:
+        start = day_start_ns(day)
+        lo = np.searchsorted(times, start, side="left")
+        hi = np.searchsorted(times, start + NS_PER_DAY, side="left")
+        result[day] = {field: columns[field][lo:hi] for field in BAR_FIELDS}
+    return result
+
+def concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    parts = [p for p in parts if len(p["time"])]
+    if not parts:
+        return empty_columns()
+    if len(parts) == 1:
+        return parts[0]
+    return {field: np.concatenate([p[field] for p in parts]) for field in BAR_FIELDS}
+
+class LiveDayBuffer:
+    """Collects closed 1m bars from the live stream and seals finished days into the store.
+
+    A day is only written when the buffered bar count matches the database,
+    so a gap in the live feed (reconnect, late subscribe) never becomes a
+    permanent file; such days are filled read-through instead.
+    """
+
+    COUNT_QUERY = """
+    SELECT count(*) AS bars
+    FROM market_data
+    WHERE symbol = :symbol AND time >= :start AND time < :end
+    """
+
+    def __init__(self, store: BarStore, timeframe: str = "1m"):
+        self.store = store
+        self.timeframe = timeframe
+        self._days: Dict[Tuple[str, date], List[dict]] = {}
+
+    def add(self, bar: dict):
+        if bar.get("timeframe") != self.timeframe:
+            return
+        day = bar["time"].astimezone(timezone.utc).date()
+        self._days.setdefault((bar["symbol"], day), []).append(bar)
+
+    async def seal_closed_days(self, db, now: Optional[datetime] = None) -> int:
+        sealed = 0
+        for (symbol, day), bars in list(self._days.items()):
+            if not self.store.is_closed(day, now):
+                continue
+            del self._days[(symbol, day)]
+            if self.store.has_day(symbol, day):
+                continue
+            start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            row = await db.fetch_one(self.COUNT_QUERY, {"symbol": symbol, "start": start, "end": start + timedelta(days=1)})
+            if row is None or row["bars"] != len(bars):
+                logger.info(f"Not sealing {symbol} {day}: {len(bars)} live bars, {row and row['bars']} in database")
+                continue
+            columns = {field: np.array([b[field] for b in bars], dtype=BAR_DTYPE[field]) for field in BAR_FIELDS if field != "time"}
+            columns["time"] = to_epoch_ns([b["time"] for b in bars])
+            self.store.write_day(symbol, day, columns)
+            sealed += 1
+        return sealed
+
+bar_store = BarStore(settings.BAR_STORE_DIR) if settings.BAR_STORE_DIR else None
@@ -0,0 +1,107 @@
+# app/services/bar_stream.py
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.utils.json_encoder import json_serializer
+
+logger = logging.getLogger(__name__)
+
+class BarSubscriber:
+    """A single client's view of the shared bar stream.
+
+    At most one pending bar is held per symbol and timeframe, so a client that
+    falls behind receives the newest bar for each instead of an unbounded
+    backlog. timeframes of None means every timeframe.
+    """
+
+    def __init__(self, timeframes: Optional[Iterable[str]] = None):
+        self.symbols: Set[str] = set()
+        self.timeframes: Optional[Set[str]] = set(timeframes) if timeframes is not None else None
+        self.coalesced = 0
+        self.closed = False
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._ready = asyncio.Event()
+
+    def wants(self, timeframe: str) -> bool:
+        return self.timeframes is None or timeframe in self.timeframes
+
+    def offer(self, key: Tuple[str, str], payload: str):
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = payload
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._pending.clear()
+        self._ready.set()
+
+    async def get(self) -> List[str]:
+        """Wait for pending bars and drain them, one per symbol and timeframe."""
+        await self._ready.wait()
+        self._ready.clear()
+        payloads = list(self._pending.values())
+        self._pending.clear()
+        return payloads
+
+class BarBroadcaster:
+    """Fans bars out from the in-process feed to every interested subscriber.
+
+    Each bar is serialized once on publish; subscribers only ever see the
+    encoded payload, which keeps per-client cost at a dict assignment.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[BarSubscriber] = set()
+        self._by_symbol: Dict[str, Set[BarSubscriber]] = {}
+        self.published = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, symbols: Iterable[str] = (), timeframes: Optional[Iterable[str]] = None) -> BarSubscriber:
+        subscriber = BarSubscriber(timeframes)
+        self._subscribers.add(subscriber)
+        self.add_symbols(subscriber, symbols)
+        return subscriber
+
+    def unsubscribe(self, subscriber: BarSubscriber):
+        self.remove_symbols(subscriber, list(subscriber.symbols))
+        self._subscribers.discard(subscriber)
+        subscriber.close()
+
+    def add_symbols(self, subscriber: BarSubscriber, symbols: Iterable[str]):
+        for symbol in symbols:
+            subscriber.symbols.add(symbol)
+            self._by_symbol.setdefault(symbol, set()).add(subscriber)
+
+    def remove_symbols(self, subscriber: BarSubscriber, symbols: Iterable[str]):
+        for symbol in symbols:
+            subscriber.symbols.discard(symbol)
+            listeners = self._by_symbol.get(symbol)
+            if listeners is None:
+                continue
+            listeners.discard(subscriber)
+            if not listeners:
+                del self._by_symbol[symbol]
+
+    def publish(self, bar: dict):
+        listeners = self._by_symbol.get(bar["symbol"])
+        self.published += 1
+        if not listeners:
+            return
+        timeframe = bar.get("timeframe")
+        key = (bar["symbol"], timeframe)
+        payload = None
+        for subscriber in listeners:
+            if subscriber.wants(timeframe):
+                if payload is None:
+                    payload = json_serializer(bar)
+                subscriber.offer(key, payload)
+
+def encode_batch(payloads: List[str]) -> str:
+    """Join already-encoded bars into a single JSON array frame."""
+    return "[" + ",".join(payloads) + "]"
+
+bar_broadcaster = BarBroadcaster()
@@ -0,0 +1,212 @@
+# app/services/frame_recorder.py
+import bisect
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Segment files hold a sequence of independently compressed blocks, each
+#   <first_ns:int64><last_ns:int64><count:uint32><compressed_len:uint32><zlib data>
+# and every block decompresses to length-prefixed records
+#   <recv_ns:int64><length:uint32><frame bytes>
+# The sidecar .idx file has one <first_ns:int64><last_ns:int64><offset:uint64>
+# entry per block, so a time range can be located without decompressing.
+BLOCK_HEADER = struct.Struct("<qqII")
+RECORD_HEADER = struct.Struct("<qI")
+INDEX_ENTRY = struct.Struct("<qqQ")
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+class FrameRecorder:
+    """Appends raw websocket frames with receive timestamps to rotating,
+    compressed segment files.
+
+    record() only enqueues; compression and file I/O happen on a background
+    thread. If the writer falls behind and the queue fills, frames are dropped
+    and counted rather than blocking the receive loop.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 256 * 1024 * 1024,
+        segment_seconds: int = 3600,
+        block_bytes: int = 256 * 1024,
+        block_seconds: float = 1.0,
+        max_queue: int = 100000,
+        compression_level: int = 6,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.block_bytes = block_bytes
+        self.block_seconds = block_seconds
+        self.compression_level = compression_level
+        self.recorded = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self._queue: "queue.Queue[Optional[Tuple[int, bytes]]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, frame: Union[str, bytes], recv_ns: Optional[int] = None):
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        try:
+            self._queue.put_nowait((time.time_ns() if recv_ns is None else recv_ns, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # A writer thread that died leaves a full queue nobody drains; don't wait on it
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+        self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        writer = None
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.block_seconds)
+                except queue.Empty:
+                    if writer is not None:
+                        writer.flush_block()
+                    continue
+                if item is None:
+                    break
+                recv_ns, frame = item
+                if writer is None or writer.should_rotate(recv_ns):
+                    if writer is not None:
+                        writer.close()
+                    writer = _SegmentWriter(
+                        self.directory, recv_ns, self.segment_bytes, self.segment_seconds, self.compression_level
+                    )
+                writer.append(recv_ns, frame)
+                self.recorded += 1
+                if writer.block_size >= self.block_bytes or writer.block_age(recv_ns) >= self.block_seconds:
+                    writer.flush_block()
+        except Exception as e:
+            logger.error(f"Frame recorder stopped: {e}", exc_info=True)
+        finally:
+            if writer is not None:
+                writer.close()
+
+class _SegmentWriter:
+    def __init__(self, directory: str, start_ns: int, segment_bytes: int, segment_seconds: int, compression_level: int):
+        self.start_ns = start_ns
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compression_level = compression_level
+        base = os.path.join(directory, f"frames-{start_ns}")
+        self._segment = open(base + SEGMENT_SUFFIX, "ab")
+        self._index = open(base + INDEX_SUFFIX, "ab")
+        self._block: List[bytes] = []
+        self._block_first_ns = None
+        self._block_last_ns = None
+        self.block_size = 0
+
+    def should_rotate(self, recv_ns: int) -> bool:
+        if self._segment.tell() >= self.segment_bytes:
+            return True
+        return recv_ns - self.start_ns >= self.segment_seconds * 1_000_000_000
+
+    def block_age(self, recv_ns: int) -> float:
+        if self._block_first_ns is None:
+            return 0.0
+        return (recv_ns - self._block_first_ns) / 1e9
+
+    def append(self, recv_ns: int, frame: bytes):
+        if self._block_first_ns is None:
+            self._block_first_ns = recv_ns
+        self._block_last_ns = recv_ns
+        self._block.append(RECORD_HEADER.pack(recv_ns, len(frame)))
+        self._block.append(frame)
+        self.block_size += RECORD_HEADER.size + len(frame)
+
+    def flush_block(self):
+        if not self._block:
+            return
+        data = zlib.compress(b"".join(self._block), self.compression_level)
+        offset = self._segment.tell()
+        self._segment.write(BLOCK_HEADER.pack(self._block_first_ns, self._block_last_ns, len(self._block) // 2, len(data)))
+        self._segment.write(data)
+        self._segment.flush()
+        # The index entry is only written once its block is on disk
+        self._index.write(INDEX_ENTRY.pack(self._block_first_ns, self._block_last_ns, offset))
+        self._index.flush()
+        self._block = []
+        self._block_first_ns = None
+        self._block_last_ns = None
+        self.block_size = 0
+
+    def close(self):
+        self.flush_block()
+        self._segment.close()
+        self._index.close()
+
+class FrameReader:
+    """Reads frames back from a recorder directory, seeking by receive time."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self) -> List[str]:
+        names = [n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX)]
+        names.sort(key=lambda n: int(n[len("frames-"):-len(SEGMENT_SUFFIX)]))
+        return [os.path.join(self.directory, n[:-len(SEGMENT_SUFFIX)]) for n in names]
+
+    def read(self, start_ns: int = 0, end_ns: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """Yield (recv_ns, frame) for frames received in [start_ns, end_ns)."""
+        for base in self.segments():
+            index = self._load_index(base)
+            if not index or index[-1][1] < start_ns:
+                continue
+            if end_ns is not None and index[0][0] >= end_ns:
+                break
+            # Blocks are written in receive order, so last_ns is sorted
+            first = bisect.bisect_left([entry[1] for entry in index], start_ns)
+            with open(base + SEGMENT_SUFFIX, "rb") as segment:
+                for first_ns, last_ns, offset in index[first:]:
+                    if end_ns is not None and first_ns >= end_ns:
+                        return
+                    segment.seek(offset)
+                    for recv_ns, frame in _read_block(segment):
+                        if recv_ns < start_ns:
+                            continue
+                        if end_ns is not None and recv_ns >= end_ns:
+                            return
+                        yield recv_ns, frame
+
+    @staticmethod
+    def _load_index(base: str) -> List[Tuple[int, int, int]]:
+        try:
+            with open(base + INDEX_SUFFIX, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+def _read_block(segment) -> Iterator[Tuple[int, bytes]]:
+    first_ns, last_ns, count, length = BLOCK_HEADER.unpack(segment.read(BLOCK_HEADER.size))
+    data = zlib.decompress(segment.read(length))
+    position = 0
+    for _ in range(count):
+        recv_ns, size = RECORD_HEADER.unpack_from(data, position)
+        position += RECORD_HEADER.size
+        yield recv_ns, data[position:position + size]
+        position += size
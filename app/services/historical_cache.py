@@ -0,0 +1,84 @@
+# app/services/historical_cache.py
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import numpy as np
+from redis.exceptions import RedisError
+from app.core.cache import get_many_values, set_many_values
+from app.core.config import settings
+from app.services.bar_store import concat_columns, is_day_closed
+from app.services.historical_data import fetch_day_tail, fetch_days
+from app.utils.columnar import decode_numpy_columns, encode_numpy_columns
+
+logger = logging.getLogger(__name__)
+
+def chunk_key(symbol: str, day: date, closed: bool) -> str:
+    # The open day has its own key so a partial chunk can never be read as a closed day
+    key = f"hist:{symbol.upper()}:{day.isoformat()}"
+    return key if closed else f"{key}:open"
+
+class DayChunkCache:
+    """Bars in Redis as one packed chunk per symbol and UTC day.
+
+    Any range is assembled from whole-day chunks, so overlapping requests
+    share work. Closed days with bars never expire; empty ones (weekends,
+    holidays, symbols with no data) expire after empty_day_seconds so they
+    cannot pile up. The open day expires after
+    open_day_seconds and, while cached, is topped up with only the rows after
+    its last bar. Redis being unavailable degrades to database reads.
+    """
+
+    def __init__(self, open_day_seconds: int = 3600, empty_day_seconds: int = 86400):
+        self.open_day_seconds = open_day_seconds
+        self.empty_day_seconds = empty_day_seconds
+
+    async def load(self, db, symbol: str, days: List[date], now: Optional[datetime] = None) -> Dict[date, Dict[str, np.ndarray]]:
+        closed = {day: is_day_closed(day, now) for day in days}
+        keys = [chunk_key(symbol, day, closed[day]) for day in days]
+        writable = True
+        try:
+            cached = await get_many_values(keys)
+        except RedisError as e:
+            logger.warning(f"Historical cache unavailable, reading from the database: {e}")
+            cached = [None] * len(days)
+            writable = False
+
+        result = {}
+        missing = []
+        updated_open = {}
+        for day, key, value in zip(days, keys, cached):
+            columns = decode_numpy_columns(value) if value is not None else None
+            if columns is None or (not closed[day] and len(columns["time"]) == 0):
+                missing.append(day)
+                continue
+            if not closed[day]:
+                tail = await fetch_day_tail(db, symbol, day, int(columns["time"][-1]))
+                if len(tail["time"]):
+                    columns = concat_columns([columns, tail])
+                    updated_open[key] = columns
+            result[day] = columns
+
+        fetched = await fetch_days(db, symbol, missing)
+        result.update(fetched)
+
+        if writable:
+            try:
+                closed_chunks = {day: c for day, c in fetched.items() if closed[day]}
+                await set_many_values(
+                    {chunk_key(symbol, day, True): encode_numpy_columns(c) for day, c in closed_chunks.items() if len(c["time"])},
+                    expiration=None,
+                )
+                await set_many_values(
+                    {chunk_key(symbol, day, True): encode_numpy_columns(c) for day, c in closed_chunks.items() if not len(c["time"])},
+                    expiration=self.empty_day_seconds,
+                )
+                updated_open.update({chunk_key(symbol, day, False): c for day, c in fetched.items() if not closed[day]})
+                await set_many_values(
+                    {key: encode_numpy_columns(c) for key, c in updated_open.items()},
+                    expiration=self.open_day_seconds,
+                )
+            except RedisError as e:
+                logger.warning(f"Could not write historical cache: {e}")
+        return result
+
+day_chunk_cache = DayChunkCache(settings.HISTORICAL_OPEN_DAY_CACHE_SECONDS) if settings.HISTORICAL_CACHE_ENABLED else None
@@ -0,0 +1,185 @@
+# app/services/historical_data.py
+import base64
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.db.statements import register
+from app.services.bar_store import BarStore, concat_columns, days_between, slice_range, split_by_day
+from app.utils.columnar import rows_to_columns, to_epoch_ns
+
+HISTORICAL_QUERY = """
+SELECT time, open, high, low, close, volume
+FROM market_data
+WHERE symbol = :symbol AND time BETWEEN :start_date AND :end_date
+ORDER BY time ASC
+"""
+
+# Any set of whole UTC days in one query, one index range scan per day
+DAYS_QUERY = register("market_data_days", """
+SELECT m.time, m.open, m.high, m.low, m.close, m.volume
+FROM unnest(CAST(:day_starts AS timestamptz[])) AS d(day_start)
+JOIN market_data m ON m.symbol = :symbol
+    AND m.time >= d.day_start AND m.time < d.day_start + interval '1 day'
+ORDER BY m.time ASC
+""")
+
+# Rows of one day after the last one already held
+DAY_TAIL_QUERY = register("market_data_day_tail", """
+SELECT time, open, high, low, close, volume
+FROM market_data
+WHERE symbol = :symbol AND time > :after AND time < :end_date
+ORDER BY time ASC
+""")
+
+# Keyset pagination on time: each chunk picks up strictly after the last row
+# of the previous one, so no OFFSET scans and no state held between chunks.
+FIRST_CHUNK_QUERY = """
+SELECT time, open, high, low, close, volume
+FROM market_data
+WHERE symbol = :symbol AND time >= :start_date AND time <= :end_date
+ORDER BY time ASC
+LIMIT :limit
+"""
+
+NEXT_CHUNK_QUERY = """
+SELECT time, open, high, low, close, volume
+FROM market_data
+WHERE symbol = :symbol AND time > :after AND time <= :end_date
+ORDER BY time ASC
+LIMIT :limit
+"""
+
+# Coarsest first; tables maintained by MarketDataWriter (app/db/rollups.sql)
+ROLLUP_TABLES = ((86400, "market_data_1d"), (3600, "market_data_1h"))
+
+ROLLUP_QUERY = """
+SELECT time, open, high, low, close, volume
+FROM {table}
+WHERE symbol = :symbol AND time BETWEEN :start_date AND :end_date
+ORDER BY time ASC
+"""
+
+def rollup_table_for(timeframe_seconds: int) -> Optional[str]:
+    """The coarsest rollup whose buckets tile the requested timeframe exactly, if any."""
+    for seconds, table in ROLLUP_TABLES:
+        if timeframe_seconds % seconds == 0:
+            return table
+    return None
+
+async def fetch_rollup_bars(db, table: str, symbol: str, start_date: datetime, end_date: datetime):
+    """Rollup bars whose bucket starts within the range."""
+    return await db.fetch_all(ROLLUP_QUERY.format(table=table), {
+        "symbol": symbol,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+
+def encode_cursor(last_time: datetime) -> str:
+    return base64.urlsafe_b64encode(last_time.isoformat().encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> datetime:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+
+async def fetch_bars(db, symbol: str, start_date: datetime, end_date: datetime):
+    return await db.fetch_all(HISTORICAL_QUERY, {
+        "symbol": symbol,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+
+async def iter_bar_chunks(
+    db,
+    symbol: str,
+    start_date: datetime,
+    end_date: datetime,
+    after: Optional[datetime] = None,
+    chunk_rows: int = 5000,
+    limit: Optional[int] = None,
+) -> AsyncIterator[List]:
+    """Yield bars in time order, at most chunk_rows at a time.
+
+    Stops after limit rows when one is given. `after` resumes strictly after
+    a previously returned row (see encode_cursor).
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_rows if remaining is None else min(chunk_rows, remaining)
+        if after is None:
+            rows = await db.fetch_all(FIRST_CHUNK_QUERY, {
+                "symbol": symbol, "start_date": start_date, "end_date": end_date, "limit": size
+            })
+        else:
+            rows = await db.fetch_all(NEXT_CHUNK_QUERY, {
+                "symbol": symbol, "after": after, "end_date": end_date, "limit": size
+            })
+        if not rows:
+            return
+        yield rows
+        after = rows[-1]["time"]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+async def fetch_days(db, symbol: str, days: List[date]) -> Dict[date, Dict[str, np.ndarray]]:
+    """Columns for each of the given UTC days, in a single query."""
+    if not days:
+        return {}
+    rows = await db.fetch_all(DAYS_QUERY, {"symbol": symbol, "day_starts": [day_start(day) for day in days]})
+    return split_by_day(rows_to_columns(rows), days)
+
+async def fetch_day_tail(db, symbol: str, day: date, after_ns: int) -> Dict[str, np.ndarray]:
+    rows = await db.fetch_all(DAY_TAIL_QUERY, {
+        "symbol": symbol,
+        "after": pd.Timestamp(after_ns, tz="UTC").to_pydatetime(),
+        "end_date": day_start(day) + timedelta(days=1),
+    })
+    return rows_to_columns(rows)
+
+def day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+async def load_bar_columns(
+    db,
+    symbol: str,
+    start_date: datetime,
+    end_date: datetime,
+    store: Optional[BarStore] = None,
+    chunk_cache=None,
+    now: Optional[datetime] = None,
+) -> Dict[str, np.ndarray]:
+    """Bars for [start_date, end_date] as columns, assembled from whole days.
+
+    Closed days are sliced out of the memory-mapped bar store when there is
+    one. The other days come from the Redis day-chunk cache when there is
+    one, and only the days neither holds are read from the database, in one
+    query. Closed days read that way are written back to the store.
+    """
+    if store is None and chunk_cache is None:
+        return rows_to_columns(await fetch_bars(db, symbol, start_date, end_date))
+
+    start_ns, end_ns = (int(t) for t in to_epoch_ns([start_date, end_date]))
+    if end_ns < start_ns:
+        return rows_to_columns([])
+    days = days_between(start_ns, end_ns)
+
+    per_day = {}
+    if store is not None:
+        for day in days:
+            if store.is_closed(day, now):
+                records = store.read_day(symbol, day)
+                if records is not None:
+                    per_day[day] = slice_range(records, start_ns, end_ns)
+
+    remaining = [day for day in days if day not in per_day]
+    if chunk_cache is not None:
+        loaded = await chunk_cache.load(db, symbol, remaining, now)
+    else:
+        loaded = await fetch_days(db, symbol, remaining)
+    for day, columns in loaded.items():
+        if store is not None and store.is_closed(day, now):
+            store.write_day(symbol, day, columns)
+        per_day[day] = slice_range(columns, start_ns, end_ns)
+    return concat_columns([per_day[day] for day in days])
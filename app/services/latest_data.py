@@ -0,0 +1,89 @@
+# app/services/latest_data.py
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.cache import get_many_or_load
+from app.db.statements import register
+
+logger = logging.getLogger(__name__)
+
+LATEST_CACHE_SECONDS = 60
+
+# Newest row per symbol in one pass, instead of one ORDER BY ... LIMIT 1 per symbol
+LATEST_BARS_QUERY = register("latest_bars", """
+SELECT DISTINCT ON (symbol) symbol, time, open, high, low, close, volume
+FROM market_data
+WHERE symbol = ANY(:symbols)
+ORDER BY symbol, time DESC
+""")
+
+BAR_KEYS = ("time", "open", "high", "low", "close", "volume")
+
+class LatestBarTable:
+    """Newest live bar per symbol, updated from the Polygon stream.
+
+    Entries older than max_age_seconds (symbol no longer streamed, market
+    closed) are treated as missing so callers fall back to cache and database.
+    """
+
+    def __init__(self, max_age_seconds: float = 60):
+        self.max_age_seconds = max_age_seconds
+        self._bars: Dict[str, Tuple[float, dict]] = {}
+
+    def update(self, bar: dict):
+        self._bars[bar["symbol"]] = (time.monotonic(), bar)
+
+    def get(self, symbol: str) -> Optional[dict]:
+        entry = self._bars.get(symbol)
+        if entry is None or time.monotonic() - entry[0] > self.max_age_seconds:
+            return None
+        bar = entry[1]
+        return {key: bar[key] for key in BAR_KEYS}
+
+    def __len__(self):
+        return len(self._bars)
+
+latest_bars = LatestBarTable(settings.LATEST_LIVE_MAX_AGE_SECONDS)
+
+def latest_cache_key(symbol: str) -> str:
+    return f"latest_data:{symbol}"
+
+async def get_latest_bars(db, symbols: List[str], live: Optional[LatestBarTable] = latest_bars) -> Dict[str, Optional[dict]]:
+    """Latest bar for each symbol, None where there is no data.
+
+    Symbols on the live stream are answered from memory. For the rest: one
+    MGET for the cache and one query for all misses not already being
+    loaded by a concurrent request, with the results cached in one pipeline.
+    Redis being unavailable degrades to one database query.
+    """
+    result = {}
+    if live is not None:
+        for symbol in symbols:
+            bar = live.get(symbol)
+            if bar is not None:
+                result[symbol] = bar
+    remaining = [s for s in symbols if s not in result]
+    if not remaining:
+        return result
+
+    symbol_by_key = {latest_cache_key(s): s for s in remaining}
+
+    async def load(keys: List[str]) -> Dict[str, dict]:
+        rows = await db.fetch_all(LATEST_BARS_QUERY, {"symbols": [symbol_by_key[k] for k in keys]})
+        found = {}
+        for row in rows:
+            data = dict(row)
+            found[latest_cache_key(data.pop("symbol"))] = data
+        return found
+
+    keys = list(symbol_by_key)
+    try:
+        values = await get_many_or_load(keys, load, expiration=LATEST_CACHE_SECONDS)
+    except RedisError as e:
+        logger.warning(f"Latest data cache unavailable, reading from the database: {e}")
+        loaded = await load(keys)
+        values = [loaded.get(key) for key in keys]
+    result.update(zip(remaining, values))
+    return {symbol: result[symbol] for symbol in symbols}
@@ -0,0 +1,87 @@
+# app/services/market_data_writer.py
+import asyncio
+import logging
+from typing import Callable, List
+from app.utils.json_encoder import json_serializer
+
+logger = logging.getLogger(__name__)
+
+def _rollup_upsert(table: str, bucket_function: str) -> str:
+    return f"""
+    INSERT INTO {table} AS r (symbol, time, open, high, low, close, volume, first_time, last_time)
+    SELECT symbol, {bucket_function}(time), (array_agg(open ORDER BY time))[1], max(high), min(low),
+           (array_agg(close ORDER BY time DESC))[1], sum(volume), min(time), max(time)
+    FROM inserted
+    GROUP BY 1, 2
+    ON CONFLICT (symbol, time) DO UPDATE SET
+        open = CASE WHEN EXCLUDED.first_time < r.first_time THEN EXCLUDED.open ELSE r.open END,
+        high = GREATEST(r.high, EXCLUDED.high),
+        low = LEAST(r.low, EXCLUDED.low),
+        close = CASE WHEN EXCLUDED.last_time > r.last_time THEN EXCLUDED.close ELSE r.close END,
+        volume = r.volume + EXCLUDED.volume,
+        first_time = LEAST(r.first_time, EXCLUDED.first_time),
+        last_time = GREATEST(r.last_time, EXCLUDED.last_time)
+    """
+
+# Minute bars and both rollups in one statement. Only rows that were actually
+# inserted feed the rollups, so writing the same bar twice is harmless.
+# Tables and bucket functions: app/db/rollups.sql
+WRITE_BARS_QUERY = f"""
+WITH bars AS (
+    SELECT * FROM jsonb_to_recordset(CAST(:bars AS jsonb)) AS b(
+        symbol text, time timestamptz, open float8, high float8, low float8, close float8, volume float8
+    )
+), inserted AS (
+    INSERT INTO market_data (symbol, time, open, high, low, close, volume)
+    SELECT symbol, time, open, high, low, close, volume FROM bars
+    ON CONFLICT (symbol, time) DO NOTHING
+    RETURNING symbol, time, open, high, low, close, volume
+), hourly AS (
+    {_rollup_upsert("market_data_1h", "market_hour_bucket")}
+)
+{_rollup_upsert("market_data_1d", "market_day_bucket")}
+"""
+
+BAR_KEYS = ("symbol", "time", "open", "high", "low", "close", "volume")
+
+class MarketDataWriter:
+    """Batches closed 1m bars from the live stream into market_data and the rollups."""
+
+    def __init__(self, get_db: Callable, flush_seconds: float = 1.0, max_pending: int = 100_000, timeframe: str = "1m"):
+        self.get_db = get_db
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.timeframe = timeframe
+        self._pending: List[dict] = []
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, bar: dict):
+        if bar.get("timeframe") != self.timeframe:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append({key: bar[key] for key in BAR_KEYS})
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        bars, self._pending = self._pending, []
+        try:
+            await self.get_db().execute(WRITE_BARS_QUERY, {"bars": json_serializer(bars)})
+        except Exception as e:
+            logger.error(f"Error writing {len(bars)} bars: {e}", exc_info=True)
+            # Keep them for the next flush; re-inserting is a no-op for rows that did land
+            self._pending = (bars + self._pending)[:self.max_pending]
+            return 0
+        self.written += len(bars)
+        return len(bars)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_seconds)
+                await self.flush()
+        finally:
+            await self.flush()
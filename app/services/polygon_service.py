@@ -1,9 +1,19 @@
 import asyncio
+import json
 import logging
-from typing import Optional, Union
+from datetime import datetime, timezone
+from typing import Hashable, Iterable, Optional, Set, Union
 from polygon import WebSocketClient, RESTClient
-from polygon.websocket.models import Feed, Market, EquityAgg
+from polygon.websocket.models import Feed, Market, EquityAgg, parse
 from app.core.config import settings
+from app.db.database import get_db
+from app.services.bar_aggregator import BarAggregator
+from app.services.bar_store import BarStore, LiveDayBuffer, bar_store
+from app.services.bar_stream import BarBroadcaster, bar_broadcaster
+from app.services.frame_recorder import FrameRecorder
+from app.services.latest_data import LatestBarTable, latest_bars
+from app.services.market_data_writer import MarketDataWriter
+from app.services.subscription_manager import SubscriptionManager
 from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
@@ -34,10 +44,35 @@ class ApiCallHandler:
     def get_symbol_details(self, symbol):
         return self.client.get_ticker_details(symbol)
 
+def agg_to_bar(agg: EquityAgg) -> dict:
+    return {
+        "symbol": agg.symbol,
+        "time": datetime.fromtimestamp(agg.start_timestamp / 1000, tz=timezone.utc),
+        "open": agg.open,
+        "high": agg.high,
+        "low": agg.low,
+        "close": agg.close,
+        "volume": agg.volume,
+        "timeframe": "1s",
+    }
+
 class MessageHandler:
-    def __init__(self, api_call_handler):
+    def __init__(
+        self,
+        api_call_handler,
+        broadcaster: BarBroadcaster = bar_broadcaster,
+        fetch_symbol_details: bool = True,
+        latest: LatestBarTable = latest_bars,
+    ):
         self.handler_queue = asyncio.Queue()
         self.api_call_handler = api_call_handler
+        self.broadcaster = broadcaster
+        self.latest = latest
+        self.fetch_symbol_details = fetch_symbol_details
+        self.known_symbols: Set[str] = set()
+        # Closed higher-timeframe bars go out on the same stream as the raw seconds
+        self.aggregator = BarAggregator(settings.BAR_TIMEFRAMES.split(","))
+        self.aggregator.on_close(self.broadcaster.publish)
 
     async def add(self, message: Optional[Union[str, bytes, list]]) -> None:
         await self.handler_queue.put(message)
@@ -45,48 +80,154 @@ class MessageHandler:
     async def start_handling(self) -> None:
         while True:
             message = await self.handler_queue.get()
-            logger.info(f"Received message: {message}")
+            logger.debug(f"Received message: {message}")
             try:
                 if isinstance(message, list):
                     for msg in message:
                         if isinstance(msg, EquityAgg):
-                            logger.info(f"Received data for {msg.symbol}: {msg}")
-                            await self.api_call_handler.enqueue_api_call(msg.symbol)
-                elif isinstance(message, dict) and message.get("ev") == "status":
-                    logger.info(f"Received status message: {message}")
+                            bar = agg_to_bar(msg)
+                            self.latest.update(bar)
+                            self.broadcaster.publish(bar)
+                            self.aggregator.update(msg)
+                            # Details only need fetching once per symbol, not once per aggregate
+                            if self.fetch_symbol_details and msg.symbol not in self.known_symbols:
+                                self.known_symbols.add(msg.symbol)
+                                await self.api_call_handler.enqueue_api_call(msg.symbol)
             except Exception as e:
                 logger.error(f"Error handling message: {e}")
             finally:
                 self.handler_queue.task_done()
 
+    async def close_idle_bars(self, interval: float = 1.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.aggregator.advance_clock()
+
+def log_status(message: dict):
+    if message.get("status") in ("auth_failed", "error"):
+        logger.error(f"Polygon status: {message.get('status')}: {message.get('message')}")
+    else:
+        logger.info(f"Polygon status: {message.get('status')}: {message.get('message')}")
+
+def create_frame_recorder() -> Optional[FrameRecorder]:
+    if not settings.POLYGON_RECORD_DIR:
+        return None
+    return FrameRecorder(
+        settings.POLYGON_RECORD_DIR,
+        segment_bytes=settings.POLYGON_RECORD_SEGMENT_MB * 1024 * 1024,
+        segment_seconds=settings.POLYGON_RECORD_SEGMENT_SECONDS,
+    )
+
 class PolygonWebSocket:
-    def __init__(self):
+    def __init__(
+        self,
+        recorder: Optional[FrameRecorder] = None,
+        feed: Union[str, Feed] = Feed.Delayed,
+        secure: bool = True,
+        broadcaster: BarBroadcaster = bar_broadcaster,
+        fetch_symbol_details: bool = True,
+        store: Optional[BarStore] = None,
+        writer: Optional[MarketDataWriter] = None,
+    ):
         self.api_key = settings.POLYGON_API_KEY
+        # Raw mode hands us the frames as received, so they can be recorded before parsing
         self.client = WebSocketClient(
             api_key=self.api_key,
-            feed=Feed.Delayed,
+            feed=feed,
             market=Market.Stocks,
-            subscriptions=["A.*"]
+            raw=True,
+            secure=secure,
+            subscriptions=[]
+        )
+        self.recorder = recorder
+        # Only symbols somebody is using are subscribed upstream, instead of A.*
+        self.subscriptions = SubscriptionManager(
+            self.client,
+            debounce_seconds=settings.POLYGON_SUBSCRIBE_DEBOUNCE_SECONDS,
+            linger_seconds=settings.POLYGON_UNSUBSCRIBE_LINGER_SECONDS,
         )
         self.api_call_handler = ApiCallHandler()
-        self.message_handler = MessageHandler(self.api_call_handler)
+        self.message_handler = MessageHandler(self.api_call_handler, broadcaster, fetch_symbol_details)
+        # Live 1m bars fill the on-disk bar store once their day closes
+        self.live_days = LiveDayBuffer(store) if store is not None else None
+        if self.live_days is not None:
+            self.message_handler.aggregator.on_close(self.live_days.add)
+        # Closed 1m bars are persisted, with the 1h/1d rollups, when a writer is given
+        self.writer = writer
+        if self.writer is not None:
+            self.message_handler.aggregator.on_close(self.writer.add)
         logger.info(f"Initialized PolygonWebSocket with API key: {self.api_key[:5]}...")
 
     async def start_event_stream(self):
         try:
             await asyncio.gather(
-                self.client.connect(self.message_handler.add),
+                self.client.connect(self.handle_frame),
                 self.message_handler.start_handling(),
+                self.message_handler.close_idle_bars(),
                 self.api_call_handler.start_processing_api_calls(),
+                self.subscriptions.run(),
+                self.seal_closed_days(),
+                self.write_bars(),
             )
         except Exception as e:
-            logger.error(f"Error in WebSocket stream: {e}")
+            logger.error(f"Error in WebSocket stream: {e}", exc_info=True)
+            raise
+
+    async def seal_closed_days(self, interval: float = 300):
+        if self.live_days is None:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                sealed = await self.live_days.seal_closed_days(get_db())
+                if sealed:
+                    logger.info(f"Sealed {sealed} closed days into the bar store")
+            except Exception as e:
+                logger.error(f"Error sealing closed days: {e}", exc_info=True)
+
+    async def write_bars(self):
+        if self.writer is not None:
+            await self.writer.run()
+
+    async def handle_frame(self, frame: Union[str, bytes]):
+        if self.recorder is not None:
+            self.recorder.record(frame)
+        raw = json.loads(frame)
+        if isinstance(raw, dict):
+            raw = [raw]
+        # parse() drops status messages, so auth and subscription results are logged here
+        for message in raw:
+            if message.get("ev") == "status":
+                log_status(message)
+        messages = parse(raw, logger)
+        if messages:
+            await self.message_handler.add(messages)
+
+    @property
+    def connection(self):
+        return self.client.websocket
+
+    @property
+    def subscribed_symbols(self) -> Set[str]:
+        return self.subscriptions.symbols
+
+    async def subscribe(self, symbols: Iterable[str], owner: Hashable = None):
+        self.subscriptions.acquire(owner, [s.upper() for s in symbols])
+
+    async def unsubscribe(self, symbols: Iterable[str], owner: Hashable = None):
+        self.subscriptions.release(owner, [s.upper() for s in symbols])
 
     async def shutdown(self):
-        self.client.close()
+        await self.client.close()
+        if self.recorder is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.recorder.close)
         logger.info("Polygon WebSocket connection closed")
 
-polygon_ws = PolygonWebSocket()
+polygon_ws = PolygonWebSocket(
+    recorder=create_frame_recorder(),
+    store=bar_store,
+    writer=MarketDataWriter(get_db) if settings.MARKET_DATA_WRITER_ENABLED else None,
+)
 
 async def initialize_polygon_websocket():
     global polygon_ws
@@ -0,0 +1,88 @@
+# app/services/resampling.py
+from typing import Dict
+import numpy as np
+import pandas as pd
+from app.services.bar_aggregator import MARKET_TZ
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_MINUTE = 60 * NS_PER_SECOND
+NS_PER_DAY = 86400 * NS_PER_SECOND
+
+# Session starts as minutes after Eastern midnight: pre-market, regular, after-hours
+_SESSION_STARTS = np.array([4 * 60, 9 * 60 + 30, 16 * 60]) * NS_PER_MINUTE
+
+def bucket_starts(times: np.ndarray, seconds: int) -> np.ndarray:
+    """Bucket start (epoch ns) for each timestamp.
+
+    Intraday buckets are aligned to the start of the trading session and never
+    span two sessions, the same as the live BarAggregator; buckets of a day or
+    more are aligned to Eastern midnight.
+    """
+    utc = pd.DatetimeIndex(times.astype("datetime64[ns]")).tz_localize("UTC")
+    local = utc.tz_convert(MARKET_TZ).tz_localize(None).asi8
+    day = local - local % NS_PER_DAY
+    length = seconds * NS_PER_SECOND
+    if seconds >= 86400:
+        start = day - (day // NS_PER_DAY) % (seconds // 86400) * NS_PER_DAY
+    else:
+        offset = local - day
+        session = np.searchsorted(_SESSION_STARTS, offset, side="right") - 1
+        session_start = day + np.where(session >= 0, _SESSION_STARTS[np.maximum(session, 0)], 0)
+        start = session_start + (local - session_start) // length * length
+    localized = pd.DatetimeIndex(start.astype("datetime64[ns]")).tz_localize(
+        MARKET_TZ, ambiguous=np.ones(len(start), dtype=bool), nonexistent="shift_forward"
+    )
+    return localized.tz_convert("UTC").asi8
+
+def resample_ohlcv(columns: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Roll time-sorted OHLCV columns up to bars of the given length."""
+    times = columns["time"]
+    if len(times) == 0:
+        return {name: array[:0] for name, array in columns.items()}
+    keys = bucket_starts(times, seconds)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.concatenate((starts[1:], [len(keys)])) - 1
+    return {
+        "time": keys[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the threshold points that best
+    preserve the visual shape of y(x). Always keeps the first and last point."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def downsample_lttb(columns: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+    """Keep at most max_points rows, chosen by LTTB on the close price."""
+    indices = lttb_indices(columns["time"], columns["close"], max_points)
+    if len(indices) == len(columns["time"]):
+        return columns
+    return {name: array[indices] for name, array in columns.items()}
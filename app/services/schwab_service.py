@@ -6,6 +6,7 @@ from app.db.database import get_db
 async def get_schwab_credentials(user_id: int):
     db = get_db()
     credentials = await db.fetch_one(
+        # Not the registered statement: trading also needs callback_url and account_hash
         "SELECT * FROM api_keys WHERE user_id = :user_id AND key_name = 'schwab'",
         {"user_id": user_id}
     )
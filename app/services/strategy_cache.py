@@ -0,0 +1,56 @@
+# app/services/strategy_cache.py
+import logging
+import uuid
+from typing import Awaitable, Callable, Optional
+from redis.exceptions import RedisError
+from app.core.cache import get_many_values, invalidate, set_many_values
+from app.models.strategy import Strategy
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_CACHE_SECONDS = 3600
+# Outlives any entry stamped with it, so a write is never forgotten while a stale entry could still be read
+STRATEGY_VERSION_SECONDS = 2 * STRATEGY_CACHE_SECONDS
+
+def strategy_cache_key(user_id: int, strategy_id: int) -> str:
+    return f"strategy:{user_id}:{strategy_id}"
+
+def strategy_version_key(user_id: int, strategy_id: int) -> str:
+    # Keep this namespace out of CACHE_L1_NAMESPACES; every worker must see the current version
+    return f"strategy_version:{user_id}:{strategy_id}"
+
+async def get_cached_strategy(user_id: int, strategy_id: int, load: Callable[[], Awaitable[Optional[Strategy]]]) -> Optional[Strategy]:
+    """A user's strategy with its components, from the cache or load() on a miss.
+
+    Every write replaces the strategy's version token. Entries are stamped
+    with the token read before their load, so a read that raced a write
+    stores an entry that no longer matches and is never served. Redis being
+    down falls back to load().
+    """
+    key = strategy_cache_key(user_id, strategy_id)
+    try:
+        entry, version = await get_many_values([key, strategy_version_key(user_id, strategy_id)])
+    except RedisError as e:
+        logger.warning(f"Strategy cache unavailable, reading from the database: {e}")
+        return await load()
+    if entry is not None and entry.get("version") == version:
+        return Strategy.model_validate(entry["strategy"])
+
+    strategy = await load()
+    if strategy is not None:
+        try:
+            await set_many_values(
+                {key: {"version": version, "strategy": strategy.model_dump(mode="json")}},
+                expiration=STRATEGY_CACHE_SECONDS,
+            )
+        except RedisError as e:
+            logger.warning(f"Could not cache strategy {strategy_id}: {e}")
+    return strategy
+
+async def strategy_changed(user_id: int, strategy_id: int):
+    """Call after a write to a strategy commits."""
+    try:
+        await set_many_values({strategy_version_key(user_id, strategy_id): uuid.uuid4().hex}, expiration=STRATEGY_VERSION_SECONDS)
+        await invalidate([strategy_cache_key(user_id, strategy_id)])
+    except RedisError as e:
+        logger.error(f"Could not invalidate cached strategy {strategy_id}: {e}")
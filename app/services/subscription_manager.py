@@ -0,0 +1,114 @@
+# app/services/subscription_manager.py
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SubscriptionManager:
+    """Ref-counts symbols across owners and keeps the upstream feed subscribed
+    to exactly the symbols somebody is using.
+
+    An owner is anything hashable: a user id for the REST endpoints, a stream
+    subscriber for websocket clients. Changes are debounced into one
+    subscribe and one unsubscribe frame, and released symbols linger for a
+    while before being dropped so quick re-subscribes don't churn upstream.
+    """
+
+    def __init__(self, client, debounce_seconds: float = 0.25, linger_seconds: float = 30, channel: str = "A"):
+        self.client = client
+        self.debounce_seconds = debounce_seconds
+        self.linger_seconds = linger_seconds
+        self.channel = channel
+        self._owners: Dict[str, Set[Hashable]] = {}
+        self._symbols_by_owner: Dict[Hashable, Set[str]] = {}
+        self._lingering: Dict[str, float] = {}
+        self._upstream: Set[str] = set()
+        self._changed = asyncio.Event()
+
+    @property
+    def symbols(self) -> Set[str]:
+        """Symbols currently held by at least one owner."""
+        return set(self._owners)
+
+    @property
+    def upstream_symbols(self) -> Set[str]:
+        return set(self._upstream)
+
+    def ref_count(self, symbol: str) -> int:
+        return len(self._owners.get(symbol, ()))
+
+    def owned_by(self, owner: Hashable) -> Set[str]:
+        return set(self._symbols_by_owner.get(owner, ()))
+
+    def acquire(self, owner: Hashable, symbols: Iterable[str]):
+        held = self._symbols_by_owner.setdefault(owner, set())
+        for symbol in symbols:
+            held.add(symbol)
+            self._owners.setdefault(symbol, set()).add(owner)
+            self._lingering.pop(symbol, None)
+        self._changed.set()
+
+    def release(self, owner: Hashable, symbols: Iterable[str], now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        held = self._symbols_by_owner.get(owner, set())
+        for symbol in symbols:
+            held.discard(symbol)
+            owners = self._owners.get(symbol)
+            if owners is None:
+                continue
+            owners.discard(owner)
+            if not owners:
+                del self._owners[symbol]
+                if symbol in self._upstream:
+                    self._lingering[symbol] = now
+        if not held:
+            self._symbols_by_owner.pop(owner, None)
+        self._changed.set()
+
+    def release_all(self, owner: Hashable, now: Optional[float] = None):
+        self.release(owner, list(self._symbols_by_owner.get(owner, ())), now)
+
+    def reconcile(self, now: Optional[float] = None) -> Tuple[Set[str], Set[str]]:
+        """Bring the upstream subscription set in line with demand.
+
+        Returns the symbols added and removed upstream.
+        """
+        now = time.monotonic() if now is None else now
+        for symbol, released_at in list(self._lingering.items()):
+            if now - released_at >= self.linger_seconds:
+                del self._lingering[symbol]
+
+        desired = set(self._owners) | set(self._lingering)
+        added = desired - self._upstream
+        removed = self._upstream - desired
+        # The Polygon client sends each batch as a single comma-joined frame
+        if added:
+            self.client.subscribe(*(self._topic(s) for s in sorted(added)))
+        if removed:
+            self.client.unsubscribe(*(self._topic(s) for s in sorted(removed)))
+        self._upstream = desired
+        if added or removed:
+            logger.info(f"Upstream subscriptions: +{len(added)} -{len(removed)} ({len(desired)} total)")
+        return added, removed
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self._next_expiry())
+            except asyncio.TimeoutError:
+                pass
+            # Let a burst of changes settle before touching the upstream feed
+            await asyncio.sleep(self.debounce_seconds)
+            self._changed.clear()
+            self.reconcile()
+
+    def _next_expiry(self) -> Optional[float]:
+        if not self._lingering:
+            return None
+        oldest = min(self._lingering.values())
+        return max(0.0, oldest + self.linger_seconds - time.monotonic())
+
+    def _topic(self, symbol: str) -> str:
+        return f"{self.channel}.{symbol}"
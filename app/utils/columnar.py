@@ -0,0 +1,130 @@
+# app/utils/columnar.py
+import json
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # Arrow output is only offered when pyarrow is installed
+    pyarrow = None
+
+BAR_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+JSON = "application/json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+NUMPY_COLUMNS = "application/x-numpy-columns"
+
+# Packed NumPy layout: magic, uint32 header length, a JSON header describing
+# each column, then the raw little-endian column buffers, each 8-byte aligned.
+# "time" is int64 nanoseconds since the Unix epoch, UTC.
+NUMPY_MAGIC = b"CBC1"
+_HEADER_PREFIX = struct.Struct("<4sI")
+
+def rows_to_columns(rows: Sequence, fields: Iterable[str] = BAR_FIELDS) -> Dict[str, np.ndarray]:
+    """Build one array per field straight from query result rows."""
+    columns = {}
+    for field in fields:
+        values = [row[field] for row in rows]
+        if field == "time":
+            columns[field] = to_epoch_ns(values)
+        else:
+            columns[field] = np.array(values, dtype=np.float64)
+    return columns
+
+def to_epoch_ns(values) -> np.ndarray:
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    # Naive timestamps from the database are UTC
+    return pd.to_datetime(values, utc=True).asi8.astype(np.int64, copy=False)
+
+def columns_to_records(columns: Dict[str, np.ndarray]) -> List[dict]:
+    """Turn columns back into the row dicts the JSON responses use."""
+    fields = list(columns)
+    values = []
+    for field in fields:
+        if field == "time":
+            values.append(pd.to_datetime(columns[field], utc=True).to_pydatetime())
+        else:
+            values.append(columns[field].tolist())
+    return [dict(zip(fields, row)) for row in zip(*values)]
+
+def available_formats() -> List[str]:
+    formats = [JSON, NUMPY_COLUMNS]
+    if pyarrow is not None:
+        formats.append(ARROW_STREAM)
+    return formats
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """Pick a response format from an Accept header.
+
+    Returns None when the header only names formats we cannot produce.
+    """
+    if not accept:
+        return JSON
+    offered = available_formats()
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.strip().lower()))
+    for _, _, media_type in sorted(candidates):
+        if media_type in offered:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+def encode_columns(columns: Dict[str, np.ndarray], media_type: str) -> bytes:
+    if media_type == ARROW_STREAM:
+        return encode_arrow_ipc(columns)
+    return encode_numpy_columns(columns)
+
+def encode_numpy_columns(columns: Dict[str, np.ndarray]) -> bytes:
+    rows = len(next(iter(columns.values()))) if columns else 0
+    buffers = []
+    descriptors = []
+    offset = 0
+    for name, array in columns.items():
+        data = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<")).tobytes()
+        descriptors.append({"name": name, "dtype": array.dtype.newbyteorder("<").str, "offset": offset, "nbytes": len(data)})
+        padding = -len(data) % 8
+        buffers.append(data + b"\0" * padding)
+        offset += len(data) + padding
+    header = json.dumps({"rows": rows, "columns": descriptors}).encode("utf-8")
+    header += b" " * (-(len(header) + _HEADER_PREFIX.size) % 8)
+    return _HEADER_PREFIX.pack(NUMPY_MAGIC, len(header)) + header + b"".join(buffers)
+
+def decode_numpy_columns(payload: bytes) -> Dict[str, np.ndarray]:
+    magic, header_length = _HEADER_PREFIX.unpack_from(payload)
+    if magic != NUMPY_MAGIC:
+        raise ValueError("Not a packed column payload")
+    header = json.loads(payload[_HEADER_PREFIX.size:_HEADER_PREFIX.size + header_length])
+    base = _HEADER_PREFIX.size + header_length
+    return {
+        column["name"]: np.frombuffer(payload, dtype=column["dtype"], count=column["nbytes"] // np.dtype(column["dtype"]).itemsize, offset=base + column["offset"])
+        for column in header["columns"]
+    }
+
+def encode_arrow_ipc(columns: Dict[str, np.ndarray]) -> bytes:
+    arrays = []
+    for name, array in columns.items():
+        if name == "time":
+            arrays.append(pyarrow.array(array, type=pyarrow.timestamp("ns", tz="UTC")))
+        else:
+            arrays.append(pyarrow.array(array))
+    table = pyarrow.Table.from_arrays(arrays, names=list(columns))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
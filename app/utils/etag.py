@@ -0,0 +1,25 @@
+# app/utils/etag.py
+import hashlib
+from typing import Optional
+from fastapi.responses import Response
+
+def make_etag(*parts) -> str:
+    """Weak validator from a few identifying values (not the body).
+
+    Weak because equal data can serialize differently depending on the tier
+    it was read from.
+    """
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
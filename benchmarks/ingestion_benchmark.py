@@ -0,0 +1,121 @@
+# benchmarks/ingestion_benchmark.py
+"""Drive the real ingestion pipeline against the synthetic Polygon feed.
+
+Starts benchmarks.synthetic_polygon_feed in a child process, points a
+PolygonWebSocket at it, subscribes to every generated symbol and reports
+sustained messages/s, end-to-end latency percentiles (send time to publish on
+the bar stream) and memory growth. Needs the usual app settings (.env).
+
+    python -m benchmarks.ingestion_benchmark --symbols 500 --rate 20000 --duration 60
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import resource
+import time
+import numpy as np
+from benchmarks.synthetic_polygon_feed import add_feed_arguments, config_from_args, serve
+from app.services.bar_stream import BarBroadcaster
+from app.services.polygon_service import PolygonWebSocket
+
+class MeasuringBroadcaster(BarBroadcaster):
+    """Records publish latency for raw bars, then fans out as usual."""
+
+    def __init__(self):
+        super().__init__()
+        self.latencies_ms = []
+        self.received = 0
+
+    def publish(self, bar: dict):
+        if bar.get("timeframe") == "1s":
+            self.received += 1
+            self.latencies_ms.append(time.time() * 1000 - bar["time"].timestamp() * 1000)
+        super().publish(bar)
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        # ru_maxrss is a high-water mark (KB on Linux), the best we have elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run_feed(args):
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(serve(config_from_args(args), port=args.port))
+
+async def run_benchmark(args) -> dict:
+    broadcaster = MeasuringBroadcaster()
+    ws = PolygonWebSocket(
+        feed=f"127.0.0.1:{args.port}",
+        secure=False,
+        broadcaster=broadcaster,
+        fetch_symbol_details=False,
+    )
+    ws.subscriptions.acquire("benchmark", config_from_args(args).symbols)
+    # Hold a stream subscriber on every symbol so the fan-out path is exercised too
+    stream = broadcaster.subscribe(config_from_args(args).symbols)
+
+    async def drain():
+        while True:
+            await stream.get()
+
+    tasks = [asyncio.create_task(ws.start_event_stream()), asyncio.create_task(drain())]
+    await asyncio.sleep(args.warmup)
+    start_received, start_rss = broadcaster.received, rss_mb()
+    broadcaster.latencies_ms.clear()
+    started = time.monotonic()
+    samples = []
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(1)
+        samples.append(rss_mb())
+    elapsed = time.monotonic() - started
+    received = broadcaster.received - start_received
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await ws.shutdown()
+
+    latencies = np.array(broadcaster.latencies_ms) if broadcaster.latencies_ms else np.zeros(1)
+    return {
+        "messages": received,
+        "msgs_per_sec": received / elapsed,
+        "latency_ms": {p: float(np.percentile(latencies, p)) for p in (50, 90, 99, 99.9)},
+        "latency_max_ms": float(latencies.max()),
+        "rss_start_mb": start_rss,
+        "rss_end_mb": samples[-1] if samples else start_rss,
+        "rss_peak_mb": max(samples) if samples else start_rss,
+        "coalesced": stream.coalesced,
+        "handler_backlog": ws.message_handler.handler_queue.qsize(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_feed_arguments(parser)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    feed = multiprocessing.Process(target=_run_feed, args=(args,), daemon=True)
+    feed.start()
+    try:
+        time.sleep(1)
+        result = asyncio.run(run_benchmark(args))
+    finally:
+        feed.terminate()
+
+    print(f"messages:        {result['messages']}")
+    print(f"sustained:       {result['msgs_per_sec']:.0f} msgs/s (target {args.rate:.0f}, bursts x{args.burst_factor})")
+    print("latency (ms):    " + "  ".join(f"p{p}={v:.1f}" for p, v in result["latency_ms"].items())
+          + f"  max={result['latency_max_ms']:.1f}")
+    print(f"memory (MB):     start={result['rss_start_mb']:.1f} end={result['rss_end_mb']:.1f} "
+          f"peak={result['rss_peak_mb']:.1f} growth={result['rss_end_mb'] - result['rss_start_mb']:+.1f}")
+    print(f"coalesced bars:  {result['coalesced']}")
+    print(f"handler backlog: {result['handler_backlog']} frames")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/synthetic_polygon_feed.py
+"""Local stand-in for the Polygon stocks websocket.
+
+Speaks enough of the aggregates protocol for PolygonWebSocket: the connected
+and auth status messages, subscribe/unsubscribe (including A.*), and arrays
+of A events for the subscribed symbols at a configurable rate with periodic
+bursts. Each event's start timestamp is its send time in ms, so consumers can
+measure end-to-end latency.
+
+    python -m benchmarks.synthetic_polygon_feed --symbols 500 --rate 20000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import List, Set
+import websockets
+
+logger = logging.getLogger(__name__)
+
+def make_symbols(count: int) -> List[str]:
+    return [f"SYM{i:04d}" for i in range(count)]
+
+class FeedConfig:
+    def __init__(
+        self,
+        symbols: int = 500,
+        rate: float = 10000,
+        batch: int = 50,
+        burst_factor: float = 5.0,
+        burst_every: float = 10.0,
+        burst_seconds: float = 1.0,
+        seed: int = 0,
+    ):
+        self.symbols = make_symbols(symbols)
+        self.rate = rate
+        self.batch = batch
+        self.burst_factor = burst_factor
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+        self.seed = seed
+
+    def rate_at(self, elapsed: float) -> float:
+        """Messages per second at a point in time; bursts repeat every burst_every seconds."""
+        if self.burst_every > 0 and elapsed % self.burst_every < self.burst_seconds:
+            return self.rate * self.burst_factor
+        return self.rate
+
+def _status(status: str, message: str) -> str:
+    return json.dumps([{"ev": "status", "status": status, "message": message}])
+
+class _Connection:
+    def __init__(self, websocket, config: FeedConfig):
+        self.websocket = websocket
+        self.config = config
+        self.subscribed: Set[str] = set()
+        self.random = random.Random(config.seed)
+        self.prices = {symbol: 100.0 for symbol in config.symbols}
+
+    async def serve(self):
+        await self.websocket.send(_status("connected", "Connected Successfully"))
+        producer = asyncio.create_task(self.produce())
+        try:
+            async for raw in self.websocket:
+                self.handle_command(json.loads(raw))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            producer.cancel()
+
+    def handle_command(self, command: dict):
+        action = command.get("action")
+        if action == "auth":
+            asyncio.create_task(self.websocket.send(_status("auth_success", "authenticated")))
+            return
+        topics = [t.strip() for t in command.get("params", "").split(",") if t.strip()]
+        symbols = set()
+        for topic in topics:
+            channel, _, symbol = topic.partition(".")
+            if channel != "A":
+                continue
+            symbols.update(self.config.symbols if symbol == "*" else [symbol])
+        if action == "subscribe":
+            self.subscribed |= symbols
+        elif action == "unsubscribe":
+            self.subscribed -= symbols
+        logger.info(f"{action}: {len(symbols)} symbols, {len(self.subscribed)} active")
+
+    def next_agg(self, symbol: str, now_ms: int) -> dict:
+        price = self.prices[symbol] * (1 + self.random.gauss(0, 0.0005))
+        self.prices[symbol] = price
+        spread = abs(self.random.gauss(0, 0.0005)) * price
+        return {
+            "ev": "A", "sym": symbol, "v": self.random.randint(1, 5000), "av": 0,
+            "op": 100.0, "vw": price, "o": price, "c": price,
+            "h": price + spread, "l": price - spread, "a": price, "z": 100,
+            "s": now_ms, "e": now_ms + 1000,
+        }
+
+    async def produce(self):
+        started = last = time.monotonic()
+        sent = 0.0
+        while True:
+            await asyncio.sleep(0.005)
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            if not self.subscribed:
+                continue
+            # Send whatever the target rate says is owed since the last tick
+            sent_target = sent + self.config.rate_at(now - started) * elapsed
+            owed = int(sent_target) - int(sent)
+            sent = sent_target
+            symbols = list(self.subscribed)
+            while owed > 0:
+                count = min(owed, self.config.batch)
+                now_ms = int(time.time() * 1000)
+                frame = [self.next_agg(self.random.choice(symbols), now_ms) for _ in range(count)]
+                await self.websocket.send(json.dumps(frame))
+                owed -= count
+
+async def serve(config: FeedConfig, host: str = "127.0.0.1", port: int = 8765):
+    async def handler(websocket, path=None):
+        await _Connection(websocket, config).serve()
+
+    async with websockets.serve(handler, host, port, max_size=None):
+        logger.info(f"Synthetic Polygon feed on ws://{host}:{port}/stocks ({len(config.symbols)} symbols)")
+        await asyncio.Future()
+
+def add_feed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=10000, help="messages per second outside bursts")
+    parser.add_argument("--batch", type=int, default=50, help="messages per websocket frame")
+    parser.add_argument("--burst-factor", type=float, default=5.0)
+    parser.add_argument("--burst-every", type=float, default=10.0)
+    parser.add_argument("--burst-seconds", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8765)
+
+def config_from_args(args) -> FeedConfig:
+    return FeedConfig(
+        symbols=args.symbols,
+        rate=args.rate,
+        batch=args.batch,
+        burst_factor=args.burst_factor,
+        burst_every=args.burst_every,
+        burst_seconds=args.burst_seconds,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_feed_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(config_from_args(args), port=args.port))
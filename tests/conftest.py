@@ -1,9 +1,9 @@
 import pytest
 from app.main import app
-from app.db.database import get_db
+from app.db.database import Database, get_db
+from app.core import cache
 from app.core.config import settings
 import asyncio
-from supabase import create_client, Client
 from httpx import ASGITransport, AsyncClient
 
 @pytest.fixture(scope="session")
@@ -15,17 +15,87 @@ def event_loop():
     yield loop
     loop.close()
 
-@pytest.fixture(scope="session")
-def test_db():
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+@pytest.fixture
+async def test_db():
+    # The app's own pool only opens in the lifespan, which test clients don't run
+    db = Database(settings.DATABASE_URL, min_size=1, max_size=2)
+    await db.connect()
+    yield db
+    await db.disconnect()
 
-@pytest.fixture(autouse=True)
+@pytest.fixture
 def override_dependency(test_db):
     app.dependency_overrides[get_db] = lambda: test_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
 
 @pytest.fixture
-async def authorized_client(access_token):
+async def authorized_client(access_token, override_dependency):
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         client.headers.update({"Authorization": f"Bearer {access_token}"})
-        yield client
\ No newline at end of file
+        yield client
+
+class FakeRedis:
+    """The slice of the redis client the cache helpers use, in memory."""
+
+    def __init__(self):
+        self.store = {}
+        self.expiry = {}
+        self.published = []
+        self.round_trips = 0
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.store.get(k) for k in keys]
+
+    async def delete(self, *keys):
+        self.round_trips += 1
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def set(self, key, value, ex=None):
+                def run():
+                    redis.store[key] = value.encode() if isinstance(value, str) else value
+                    redis.expiry[key] = ex
+                    return True
+                self.ops.append(run)
+
+            def mget(self, keys):
+                self.ops.append(lambda: [redis.store.get(k) for k in keys])
+
+            def pttl(self, key):
+                # Remaining time is taken to be the whole expiry the key was set with
+                def run():
+                    if key not in redis.store:
+                        return -2
+                    return -1 if redis.expiry.get(key) is None else int(redis.expiry[key] * 1000)
+                self.ops.append(run)
+
+            async def execute(self):
+                redis.round_trips += 1
+                return [op() for op in self.ops]
+
+        return Pipeline()
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache, "r", redis)
+    return redis
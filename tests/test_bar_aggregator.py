@@ -0,0 +1,84 @@
+# tests/test_bar_aggregator.py
+import pytest
+from datetime import datetime
+from polygon.websocket.models import EquityAgg
+from app.services.bar_aggregator import BarAggregator, MARKET_TZ, parse_timeframe
+
+def et_ms(hour, minute, second=0):
+    return int(datetime(2024, 3, 5, hour, minute, second, tzinfo=MARKET_TZ).timestamp() * 1000)
+
+def agg(ts, price, volume=10, symbol="AAPL"):
+    return EquityAgg(symbol=symbol, open=price, high=price + 1, low=price - 1, close=price,
+                     volume=volume, start_timestamp=ts, end_timestamp=ts + 1000)
+
+def test_parse_timeframe():
+    assert parse_timeframe("1m") == 60
+    assert parse_timeframe("15m") == 900
+    assert parse_timeframe("1h") == 3600
+    with pytest.raises(ValueError):
+        parse_timeframe("5x")
+
+def test_minute_bar_closes_when_next_minute_starts():
+    aggregator = BarAggregator(["1m"])
+    closed = []
+    aggregator.on_close(closed.append)
+    aggregator.update(agg(et_ms(10, 0, 0), 100))
+    aggregator.update(agg(et_ms(10, 0, 30), 105))
+    aggregator.update(agg(et_ms(10, 0, 59), 102))
+    assert closed == []
+
+    aggregator.update(agg(et_ms(10, 1, 0), 110))
+
+    assert len(closed) == 1
+    bar = closed[0]
+    assert bar["timeframe"] == "1m"
+    assert (bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"]) == (100, 106, 99, 102, 30)
+
+def test_hour_bars_align_to_session_and_stop_at_its_end():
+    aggregator = BarAggregator(["1h"])
+    closed = []
+    aggregator.on_close(closed.append)
+    # Pre-market ends at 09:30, so its last hourly bar is 09:00-09:30
+    aggregator.update(agg(et_ms(9, 10), 100))
+    aggregator.update(agg(et_ms(9, 31), 101))
+
+    assert closed[0]["time"].astimezone(MARKET_TZ).strftime("%H:%M") == "09:00"
+    aggregator.update(agg(et_ms(10, 31), 102))
+    # Regular session bars start at 09:30, not on the clock hour
+    assert closed[1]["time"].astimezone(MARKET_TZ).strftime("%H:%M") == "09:30"
+
+def test_quiet_symbols_close_on_stream_time():
+    aggregator = BarAggregator(["1m"])
+    aggregator.update(agg(et_ms(10, 0, 5), 100, symbol="MSFT"))
+
+    closed = aggregator.update(agg(et_ms(10, 1, 0), 50, symbol="AAPL"))
+
+    assert [bar["symbol"] for bar in closed] == ["MSFT"]
+
+def test_late_aggregates_are_counted_and_dropped():
+    aggregator = BarAggregator(["1m"])
+    aggregator.update(agg(et_ms(10, 1, 0), 100))
+    aggregator.update(agg(et_ms(10, 0, 30), 500))
+
+    assert aggregator.late == 1
+    [bar] = aggregator.flush(et_ms(10, 2, 0))
+    assert bar["high"] == 101
+
+def test_aggregates_for_a_bucket_closed_by_another_symbol_are_late():
+    aggregator = BarAggregator(["1m"])
+    closed = []
+    aggregator.on_close(closed.append)
+    aggregator.update(agg(et_ms(10, 0, 5), 100, symbol="AAPL"))
+    # MSFT moves the stream clock past 10:01, closing AAPL's 10:00 bar
+    aggregator.update(agg(et_ms(10, 1, 2), 50, symbol="MSFT"))
+    aggregator.update(agg(et_ms(10, 0, 59), 999, volume=1, symbol="AAPL"))
+    aggregator.flush(et_ms(10, 5, 0))
+
+    assert [(bar["symbol"], bar["close"]) for bar in closed] == [("AAPL", 100), ("MSFT", 50)]
+    assert aggregator.late == 1
+
+def test_aggregates_outside_sessions_are_ignored():
+    aggregator = BarAggregator(["1m"])
+    aggregator.update(agg(et_ms(21, 0), 100))
+
+    assert aggregator.flush(et_ms(23, 0)) == []
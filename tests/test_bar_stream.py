@@ -0,0 +1,125 @@
+# tests/test_bar_stream.py
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.auth import get_current_user_ws
+from app.core.config import settings
+from app.services.bar_stream import BarBroadcaster, bar_broadcaster
+
+def make_bar(symbol, close, timeframe="1s"):
+    return {
+        "timeframe": timeframe,
+        "symbol": symbol,
+        "time": datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc),
+        "open": 1.0,
+        "high": 2.0,
+        "low": 0.5,
+        "close": close,
+        "volume": 100,
+    }
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_latest_bar_per_symbol():
+    broadcaster = BarBroadcaster()
+    subscriber = broadcaster.subscribe(["AAPL", "MSFT"])
+    broadcaster.publish(make_bar("AAPL", 1.0))
+    broadcaster.publish(make_bar("MSFT", 2.0))
+    broadcaster.publish(make_bar("AAPL", 3.0))
+
+    payloads = await subscriber.get()
+
+    assert len(payloads) == 2
+    assert '"close": 3.0' in payloads[0]
+    assert '"close": 2.0' in payloads[1]
+    assert subscriber.coalesced == 1
+
+@pytest.mark.asyncio
+async def test_timeframes_are_coalesced_and_filtered_separately():
+    broadcaster = BarBroadcaster()
+    everything = broadcaster.subscribe(["AAPL"])
+    minutes = broadcaster.subscribe(["AAPL"], timeframes=["1m"])
+    broadcaster.publish(make_bar("AAPL", 1.0, "1s"))
+    broadcaster.publish(make_bar("AAPL", 2.0, "1m"))
+    broadcaster.publish(make_bar("AAPL", 3.0, "1s"))
+
+    assert len(await everything.get()) == 2
+    payloads = await minutes.get()
+    assert len(payloads) == 1
+    assert '"close": 2.0' in payloads[0]
+
+@pytest.mark.asyncio
+async def test_unsubscribed_symbols_are_not_delivered():
+    broadcaster = BarBroadcaster()
+    subscriber = broadcaster.subscribe(["AAPL", "MSFT"])
+    broadcaster.remove_symbols(subscriber, ["MSFT"])
+    broadcaster.publish(make_bar("MSFT", 2.0))
+    broadcaster.publish(make_bar("AAPL", 1.0))
+
+    payloads = await subscriber.get()
+
+    assert len(payloads) == 1
+    assert '"AAPL"' in payloads[0]
+
+@pytest.mark.asyncio
+async def test_unsubscribe_cleans_up_and_closes():
+    broadcaster = BarBroadcaster()
+    subscriber = broadcaster.subscribe(["AAPL"])
+    broadcaster.publish(make_bar("AAPL", 1.0))
+
+    broadcaster.unsubscribe(subscriber)
+
+    assert broadcaster._by_symbol == {}
+    assert broadcaster.subscriber_count == 0
+    assert await asyncio.wait_for(subscriber.get(), timeout=1) == []
+
+@pytest.fixture
+def stream_client():
+    app.dependency_overrides[get_current_user_ws] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_current_user_ws, None)
+
+def test_stream_subscribe_and_unsubscribe(stream_client):
+    with stream_client.websocket_connect("/api/v1/market-data/stream?token=x") as ws:
+        ws.send_json({"action": "subscribe", "symbols": ["aapl", "MSFT"]})
+        assert ws.receive_json() == {"ev": "status", "symbols": ["AAPL", "MSFT"], "timeframes": None}
+        ws.send_json({"action": "unsubscribe", "symbols": ["MSFT"]})
+        assert ws.receive_json() == {"ev": "status", "symbols": ["AAPL"], "timeframes": None}
+
+def test_stream_delivers_published_bars(stream_client):
+    with stream_client.websocket_connect("/api/v1/market-data/stream?token=x") as ws:
+        ws.send_json({"action": "subscribe", "symbols": ["AAPL"]})
+        ws.receive_json()
+        ws.portal.call(bar_broadcaster.publish, make_bar("AAPL", 5.0))
+        bars = ws.receive_json()
+        assert [bar["close"] for bar in bars] == [5.0]
+
+def test_stream_rejects_too_many_symbols(stream_client):
+    symbols = [f"S{i}" for i in range(settings.STREAM_MAX_SYMBOLS_PER_CLIENT + 1)]
+    with stream_client.websocket_connect("/api/v1/market-data/stream?token=x") as ws:
+        ws.send_json({"action": "subscribe", "symbols": symbols})
+        assert ws.receive_json() == {"ev": "error", "message": "Too many symbols"}
+
+@pytest.mark.parametrize("message", [
+    '{"action": "subscribe", "symbols": "MSFT"}',
+    '{"action": "subscribe", "symbols": [1, 2]}',
+    '["subscribe"]',
+    'not json',
+    '{"action": "dance", "symbols": []}',
+    '{"action": "subscribe", "symbols": ["AAPL"], "timeframes": "1m"}',
+])
+def test_stream_malformed_messages_get_error_frame(stream_client, message):
+    with stream_client.websocket_connect("/api/v1/market-data/stream?token=x") as ws:
+        ws.send_text(message)
+        assert ws.receive_json()["ev"] == "error"
+        # The connection stays usable after an error
+        ws.send_json({"action": "subscribe", "symbols": ["AAPL"]})
+        assert ws.receive_json() == {"ev": "status", "symbols": ["AAPL"], "timeframes": None}
+
+def test_stream_rejects_invalid_token():
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with TestClient(app).websocket_connect("/api/v1/market-data/stream?token=not-a-jwt"):
+            pass
+    assert exc_info.value.code == 1008
@@ -0,0 +1,45 @@
+# tests/test_cache_codec.py
+import json
+from datetime import datetime, timezone
+from app.core import cache
+from app.core.cache import CacheCodec, TAG_BYTES_ZLIB, TAG_MSGPACK, cache_stats, decode_value, encode_value
+
+def test_structured_values_round_trip_with_datetimes():
+    codec = CacheCodec()
+    value = {"time": datetime(2024, 1, 2, 14, 30), "close": 1.5, "volume": 100}
+
+    data = codec.encode(value)
+
+    assert data[0] == TAG_MSGPACK
+    assert len(data) < len(json.dumps(value, default=str))
+    # Naive timestamps are stored as UTC
+    assert codec.decode(data) == {"time": datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc), "close": 1.5, "volume": 100}
+
+def test_large_payloads_are_compressed():
+    codec = CacheCodec(compress_threshold=64)
+    payload = b"\x00" * 10_000
+
+    data = codec.encode(payload)
+
+    assert data[0] == TAG_BYTES_ZLIB
+    assert len(data) < 200
+    assert codec.decode(data) == payload
+
+def test_entries_written_before_the_codec_stay_readable():
+    codec = CacheCodec()
+    assert codec.decode(b'{"close": 1.5}') == {"close": 1.5}
+    assert codec.decode(b"CBC1 packed") == b"CBC1 packed"
+
+def test_stats_are_kept_per_namespace(monkeypatch):
+    monkeypatch.setattr(cache, "_namespace_stats", {})
+    monkeypatch.setattr(cache, "codec", CacheCodec(compress_threshold=64))
+
+    data = encode_value("hist:AAPL:2024-01-02", b"\x00" * 10_000)
+    decode_value("hist:AAPL:2024-01-02", data)
+    encode_value("latest_data:AAPL", {"close": 1.5})
+
+    stats = cache_stats()
+    assert set(stats) == {"hist", "latest_data"}
+    assert stats["hist"]["encoded"] == stats["hist"]["decoded"] == 1
+    assert stats["hist"]["compression_ratio"] > 10
+    assert stats["latest_data"]["compression_ratio"] < 1
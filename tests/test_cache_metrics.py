@@ -0,0 +1,34 @@
+# tests/test_cache_metrics.py
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.auth import get_current_user_bearer
+from app.core import cache
+from app.core.cache import get_many_or_load
+
+@pytest.mark.asyncio
+async def test_hits_misses_and_loads_are_counted_per_namespace(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "_namespace_stats", {})
+
+    async def load(keys):
+        return {key: {"close": 1.5} for key in keys}
+
+    await get_many_or_load(["latest_data:AAPL", "latest_data:MSFT"], load, 60)
+    await get_many_or_load(["latest_data:AAPL", "hist:AAPL:2024-01-02"], load, 60)
+
+    stats = cache.cache_stats()
+    assert stats["latest_data"]["misses"] == 2
+    assert stats["latest_data"]["hits"] == 1
+    assert stats["latest_data"]["loads"] == 1
+    assert stats["latest_data"]["read_bytes_avg"] > 0
+    assert stats["hist"]["misses"] == 1
+
+def test_metrics_endpoint(fake_redis):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    try:
+        response = TestClient(app).get("/api/v1/internal/metrics")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"cache", "l1", "redis_pool", "statements"}
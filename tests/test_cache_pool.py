@@ -0,0 +1,41 @@
+# tests/test_cache_pool.py
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.core import cache
+from app.core.cache import MeteredConnectionPool, get_many, pool_stats, set_many
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        pass
+
+    async def connect(self):
+        pass
+
+    async def can_read_destructive(self):
+        return False
+
+@pytest.mark.asyncio
+async def test_pool_is_bounded_and_metered(monkeypatch):
+    pool = MeteredConnectionPool(connection_class=FakeConnection, max_connections=1, timeout=0.01)
+    monkeypatch.setattr(cache, "pool", pool)
+
+    held = await pool.get_connection("GET")
+    assert pool_stats()["in_use"] == 1
+    with pytest.raises(RedisConnectionError):
+        await pool.get_connection("GET")
+    await pool.release(held)
+    await pool.release(await pool.get_connection("GET"))
+
+    stats = pool_stats()
+    assert stats["max_connections"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 0 and stats["idle"] == 1
+
+@pytest.mark.asyncio
+async def test_batch_helpers_are_single_round_trips(fake_redis):
+    await set_many({"a": "1", "b": "2"}, expiration=None)
+
+    assert await get_many(["a", "missing", "b"]) == [b"1", None, b"2"]
+    assert await get_many([]) == []
+    assert fake_redis.round_trips == 2
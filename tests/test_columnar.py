@@ -0,0 +1,36 @@
+# tests/test_columnar.py
+from datetime import datetime, timezone
+import numpy as np
+from app.utils.columnar import (
+    JSON, NUMPY_COLUMNS, columns_to_records, decode_numpy_columns, encode_numpy_columns,
+    negotiate_format, rows_to_columns,
+)
+
+ROWS = [
+    {"time": datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc), "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 100},
+    {"time": datetime(2024, 1, 2, 14, 31, tzinfo=timezone.utc), "open": 1.5, "high": 2.5, "low": 1.0, "close": 2.0, "volume": 200},
+]
+
+def test_numpy_columns_round_trip():
+    columns = rows_to_columns(ROWS)
+
+    decoded = decode_numpy_columns(encode_numpy_columns(columns))
+
+    assert list(decoded) == ["time", "open", "high", "low", "close", "volume"]
+    assert decoded["time"].dtype == np.dtype("<i8")
+    assert decoded["time"][1] - decoded["time"][0] == 60 * 10**9
+    np.testing.assert_array_equal(decoded["close"], [1.5, 2.0])
+
+def test_columns_to_records_matches_rows():
+    assert columns_to_records(rows_to_columns(ROWS)) == ROWS
+
+def test_empty_result_encodes():
+    decoded = decode_numpy_columns(encode_numpy_columns(rows_to_columns([])))
+    assert len(decoded["time"]) == 0
+
+def test_negotiate_format():
+    assert negotiate_format(None) == JSON
+    assert negotiate_format("*/*") == JSON
+    assert negotiate_format(f"{NUMPY_COLUMNS}, application/json;q=0.5") == NUMPY_COLUMNS
+    assert negotiate_format(f"application/json, {NUMPY_COLUMNS};q=0.5") == JSON
+    assert negotiate_format("text/csv") is None
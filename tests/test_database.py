@@ -0,0 +1,162 @@
+# tests/test_database.py
+import asyncpg
+import pytest
+from contextlib import asynccontextmanager
+from app.db import statements
+from app.db.database import Database, compile_query
+from app.db.statements import Statement
+
+class FakePrepared:
+    def __init__(self, connection, sql, stale=False):
+        self.connection = connection
+        self.sql = sql
+        self.stale = stale
+
+    async def fetchrow(self, *args):
+        if self.stale:
+            raise asyncpg.InvalidCachedStatementError("cached plan must not change result type")
+        self.connection.calls.append((self.sql, args))
+        return {"id": 1}
+
+    async def fetch(self, *args):
+        self.connection.calls.append((self.sql, args))
+        return []
+
+    def get_statusmsg(self):
+        return "DELETE 2"
+
+class FakeConnection:
+    def __init__(self, status="UPDATE 1", pid=1):
+        self.status = status
+        self.pid = pid
+        self.calls = []
+        self.prepared = []
+        self.transactions = 0
+        self.stale = False
+
+    def get_server_pid(self):
+        return self.pid
+
+    async def prepare(self, sql):
+        self.prepared.append(sql)
+        return FakePrepared(self, sql, stale=self.stale)
+
+    def is_in_transaction(self):
+        return self.transactions > 0
+
+    async def execute(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.status
+
+    async def fetchrow(self, sql, *args):
+        self.calls.append((sql, args))
+        return {"id": 1}
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.transactions += 1
+        yield
+
+class FakePool:
+    def __init__(self):
+        self.acquired = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        connection = FakeConnection()
+        self.acquired.append(connection)
+        yield connection
+
+def test_compile_query_binds_names_in_order():
+    sql, names = compile_query(
+        "SELECT * FROM market_data WHERE symbol = :symbol AND time >= :start::timestamptz "
+        "AND to_char(time, 'HH24:MI') > '09:30' AND time < :end AND symbol <> :symbol"
+    )
+
+    assert names == ("symbol", "start", "end")
+    assert sql == (
+        "SELECT * FROM market_data WHERE symbol = $1 AND time >= $2::timestamptz "
+        "AND to_char(time, 'HH24:MI') > '09:30' AND time < $3 AND symbol <> $1"
+    )
+
+@pytest.mark.asyncio
+async def test_execute_returns_row_count_and_rejects_missing_values():
+    db = Database("postgresql://unused")
+    db.pool = FakePool()
+
+    assert await db.execute("DELETE FROM api_keys WHERE user_id = :user_id", {"user_id": 7, "unused": 1}) == 1
+    assert db.pool.acquired[0].calls == [("DELETE FROM api_keys WHERE user_id = $1", (7,))]
+    with pytest.raises(ValueError, match="user_id"):
+        await db.execute("DELETE FROM api_keys WHERE user_id = :user_id")
+
+@pytest.mark.asyncio
+async def test_transaction_runs_every_call_on_one_connection():
+    db = Database("postgresql://unused")
+    db.pool = FakePool()
+
+    async with db.transaction():
+        await db.fetch_one("SELECT 1")
+        async with db.transaction():
+            await db.execute("SELECT 2")
+    await db.execute("SELECT 3")
+
+    first, second = db.pool.acquired
+    assert [sql for sql, _ in first.calls] == ["SELECT 1", "SELECT 2"]
+    assert first.transactions == 2
+    assert [sql for sql, _ in second.calls] == ["SELECT 3"]
+
+@pytest.mark.asyncio
+async def test_calls_fail_before_the_pool_is_open():
+    with pytest.raises(RuntimeError):
+        await Database("postgresql://unused").fetch_all("SELECT 1")
+
+@pytest.mark.asyncio
+async def test_registered_statements_are_prepared_once_per_connection_and_timed(monkeypatch):
+    monkeypatch.setattr(statements, "_timings", {})
+    lookup = Statement("test_lookup", "SELECT * FROM users WHERE username = :username")
+    cleanup = Statement("test_cleanup", "DELETE FROM api_keys WHERE user_id = :user_id")
+    connection = FakeConnection()
+    db = Database("postgresql://unused")
+    db._connection.set(connection)
+
+    await db.fetch_one(lookup, {"username": "a"})
+    await db.fetch_one(lookup, {"username": "b"})
+    assert await db.execute(cleanup, {"user_id": 7}) == 2
+
+    assert connection.prepared == ["SELECT * FROM users WHERE username = $1", "DELETE FROM api_keys WHERE user_id = $1"]
+    assert connection.calls[1] == ("SELECT * FROM users WHERE username = $1", ("b",))
+    timings = statements.statement_timings()
+    assert timings["test_lookup"]["calls"] == 2
+    assert timings["test_cleanup"]["calls"] == 1
+
+@pytest.mark.asyncio
+async def test_unreachable_database_falls_back_outside_transactions():
+    class DownPool:
+        @asynccontextmanager
+        async def acquire(self):
+            raise ConnectionRefusedError("replica down")
+            yield
+
+    primary = Database("postgresql://primary")
+    primary.pool = FakePool()
+    replica = Database("postgresql://replica", fallback=primary)
+    replica.pool = DownPool()
+
+    assert await replica.fetch_one("SELECT 1") == {"id": 1}
+    assert primary.pool.acquired[0].calls == [("SELECT 1", ())]
+    with pytest.raises(ConnectionRefusedError):
+        async with replica.transaction():
+            pass
+
+@pytest.mark.asyncio
+async def test_statement_is_reprepared_after_a_schema_change():
+    lookup = Statement("test_stale_lookup", "SELECT id FROM users WHERE username = :username")
+    connection = FakeConnection()
+    db = Database("postgresql://unused")
+    db._connection.set(connection)
+    connection.stale = True
+    await db._prepare(connection, lookup)
+    connection.stale = False
+
+    assert await db.fetch_one(lookup, {"username": "a"}) == {"id": 1}
+    assert len(connection.prepared) == 2
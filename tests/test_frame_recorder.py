@@ -0,0 +1,40 @@
+# tests/test_frame_recorder.py
+from app.services.frame_recorder import FrameReader, FrameRecorder
+
+SECOND = 1_000_000_000
+
+def record_frames(directory, **kwargs):
+    recorder = FrameRecorder(str(directory), **kwargs)
+    for i in range(100):
+        recorder.record(f'[{{"ev":"A","sym":"AAPL","c":{i}}}]', recv_ns=i * SECOND)
+    recorder.close()
+    return recorder
+
+def test_frames_round_trip(tmp_path):
+    recorder = record_frames(tmp_path)
+
+    frames = list(FrameReader(str(tmp_path)).read())
+
+    assert recorder.recorded == 100
+    assert [ns for ns, _ in frames] == [i * SECOND for i in range(100)]
+    assert frames[7][1] == b'[{"ev":"A","sym":"AAPL","c":7}]'
+
+def test_segments_rotate_and_read_seeks_by_time(tmp_path):
+    record_frames(tmp_path, segment_seconds=30, block_seconds=5)
+    reader = FrameReader(str(tmp_path))
+
+    frames = list(reader.read(start_ns=42 * SECOND, end_ns=65 * SECOND))
+
+    assert len(reader.segments()) == 4
+    assert [ns // SECOND for ns, _ in frames] == list(range(42, 65))
+
+def test_close_returns_when_the_writer_thread_died_with_a_full_queue(tmp_path):
+    recorder = FrameRecorder(str(tmp_path), max_queue=2)
+    recorder._queue.put(None)
+    recorder._thread.join()
+    recorder.record(b"a")
+    recorder.record(b"b")
+
+    recorder.close()
+
+    assert recorder.recorded == 0
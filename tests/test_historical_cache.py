@@ -0,0 +1,65 @@
+# tests/test_historical_cache.py
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.core import cache
+from app.services.historical_cache import DayChunkCache, chunk_key
+from app.services.historical_data import load_bar_columns
+from tests.test_bar_store import FakeMarketDB, START
+
+LATER = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+@pytest.mark.asyncio
+async def test_overlapping_ranges_only_fetch_missing_days(fake_redis):
+    db = FakeMarketDB()
+    chunks = DayChunkCache()
+
+    await load_bar_columns(db, "AAPL", START, START + timedelta(days=1, hours=1), chunk_cache=chunks, now=LATER)
+    columns = await load_bar_columns(db, "AAPL", START + timedelta(days=1), START + timedelta(days=2, hours=1), chunk_cache=chunks, now=LATER)
+
+    assert [q["day_starts"] for q in db.queries] == [
+        [datetime(2024, 1, 2, tzinfo=timezone.utc), datetime(2024, 1, 3, tzinfo=timezone.utc)],
+        [datetime(2024, 1, 4, tzinfo=timezone.utc)],
+    ]
+    assert len(columns["time"]) == 120
+    # Closed days never expire
+    assert fake_redis.expiry[chunk_key("AAPL", date(2024, 1, 3), True)] is None
+
+@pytest.mark.asyncio
+async def test_open_day_is_topped_up_incrementally(fake_redis):
+    db = FakeMarketDB()
+    chunks = DayChunkCache(open_day_seconds=600)
+    now = START + timedelta(hours=2)
+
+    first = await load_bar_columns(db, "AAPL", START, now, chunk_cache=chunks, now=now)
+    db.rows.append({"time": START + timedelta(minutes=60), "open": 60, "high": 61, "low": 59, "close": 60, "volume": 10})
+    second = await load_bar_columns(db, "AAPL", START, now, chunk_cache=chunks, now=now)
+
+    assert len(first["time"]) == 60
+    assert len(second["time"]) == 61
+    assert db.queries[-1]["after"] == START + timedelta(minutes=59)
+    assert fake_redis.expiry[chunk_key("AAPL", date(2024, 1, 2), False)] == 600
+    assert chunk_key("AAPL", date(2024, 1, 2), True) not in fake_redis.store
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_database(monkeypatch):
+    class DownRedis:
+        async def mget(self, keys):
+            raise RedisConnectionError("down")
+
+    monkeypatch.setattr(cache, "r", DownRedis())
+    db = FakeMarketDB()
+
+    columns = await load_bar_columns(db, "AAPL", START, START + timedelta(hours=1), chunk_cache=DayChunkCache(), now=LATER)
+
+    assert len(columns["time"]) == 60
+
+@pytest.mark.asyncio
+async def test_empty_closed_days_expire(fake_redis):
+    db = FakeMarketDB()
+
+    await load_bar_columns(db, "AAPL", START - timedelta(days=1), START + timedelta(hours=1),
+                           chunk_cache=DayChunkCache(empty_day_seconds=600), now=LATER)
+
+    assert fake_redis.expiry[chunk_key("AAPL", date(2024, 1, 1), True)] == 600
+    assert fake_redis.expiry[chunk_key("AAPL", date(2024, 1, 2), True)] is None
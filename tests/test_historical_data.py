@@ -0,0 +1,144 @@
+# tests/test_historical_data.py
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.auth import get_current_user_bearer
+from app.db.database import get_db
+from app.core import cache
+from app.core.config import settings
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.services.historical_data import decode_cursor, encode_cursor, iter_bar_chunks
+
+START = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+class FakeMarketDB:
+    """Answers the market_data queries from an in-memory list of bars."""
+
+    def __init__(self, count):
+        self.rows = [
+            {"time": START + timedelta(minutes=i), "open": i, "high": i + 1, "low": i - 1, "close": i, "volume": 10}
+            for i in range(count)
+        ]
+        self.queries = 0
+
+    async def fetch_all(self, query, values):
+        self.queries += 1
+        if "symbols" in values:
+            return [dict(self.rows[-1], symbol=values["symbols"][0])] if self.rows else []
+        if "day_starts" in values:
+            return [r for r in self.rows if any(d <= r["time"] < d + timedelta(days=1) for d in values["day_starts"])]
+        rows = [r for r in self.rows if r["time"] <= values["end_date"]]
+        if "after" in values:
+            rows = [r for r in rows if r["time"] > values["after"]]
+        else:
+            rows = [r for r in rows if r["time"] >= values["start_date"]]
+        return rows[:values["limit"]] if "limit" in values else rows
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+@pytest.mark.asyncio
+async def test_chunks_cover_range_in_order():
+    db = FakeMarketDB(25)
+    chunks = await collect(iter_bar_chunks(db, "AAPL", START, START + timedelta(days=1), chunk_rows=10))
+
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert [r["open"] for c in chunks for r in c] == list(range(25))
+
+@pytest.mark.asyncio
+async def test_limit_and_resume_after_cursor():
+    db = FakeMarketDB(25)
+    end = START + timedelta(days=1)
+    first = await collect(iter_bar_chunks(db, "AAPL", START, end, chunk_rows=10, limit=12))
+    cursor = encode_cursor(first[-1][-1]["time"])
+
+    rest = await collect(iter_bar_chunks(db, "AAPL", START, end, after=decode_cursor(cursor), chunk_rows=10))
+
+    assert sum(len(c) for c in first) == 12
+    assert rest[0][0]["open"] == 12
+    assert sum(len(c) for c in rest) == 13
+
+@pytest.fixture(autouse=True)
+def no_redis(fake_redis):
+    return fake_redis
+
+def get_historical(db, headers=None, symbol="AAPL", **params):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        return TestClient(app).get(f"/api/v1/market-data/historical/{symbol}", headers=headers, params={
+            "start_date": START.isoformat(), "end_date": (START + timedelta(days=1)).isoformat(), **params
+        })
+    finally:
+        app.dependency_overrides.pop(get_current_user_bearer, None)
+        app.dependency_overrides.pop(get_db, None)
+
+def test_stream_endpoint_writes_ndjson_with_cursor():
+    response = get_historical(FakeMarketDB(7), stream="true", limit=5)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["open"] for line in lines[:-1]] == [0, 1, 2, 3, 4]
+    assert decode_cursor(lines[-1]["next_cursor"]) == START + timedelta(minutes=4)
+
+def test_timeframe_and_max_points_shrink_the_payload():
+    response = get_historical(FakeMarketDB(120), timeframe="15m", max_points=5)
+
+    bars = response.json()
+    assert response.status_code == 200
+    assert len(bars) == 5
+    assert bars[0] == {"time": "2024-01-02T14:30:00+00:00", "open": 0.0, "high": 15.0, "low": -1.0, "close": 14.0, "volume": 150.0}
+
+def test_invalid_symbols_are_rejected_before_any_read():
+    db = FakeMarketDB(7)
+
+    for symbol in ("...", "%2E%2E", "NOT_A_TICKER", "ABCDEFGHIJKLM"):
+        assert get_historical(db, symbol=symbol).status_code == 400
+    assert db.queries == 0
+
+def test_invalid_timeframe_is_rejected():
+    assert get_historical(FakeMarketDB(1), timeframe="7x").status_code == 400
+
+def test_timeframe_reads_rollup_table_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "ROLLUPS_ENABLED", True)
+    db = FakeMarketDB(3)
+    queries = []
+    original = db.fetch_all
+
+    async def fetch_all(query, values):
+        queries.append(query)
+        return await original(query, values)
+
+    db.fetch_all = fetch_all
+    response = get_historical(db, timeframe="1h")
+
+    assert response.status_code == 200
+    assert len(queries) == 1 and "market_data_1h" in queries[0]
+
+def test_repeated_closed_range_gets_304_without_reading_bars():
+    db = FakeMarketDB(5)
+    first = get_historical(db)
+    etag = first.headers["etag"]
+    queries = db.queries
+
+    second = get_historical(db, headers={"If-None-Match": etag})
+
+    assert etag.startswith('W/"')
+    assert second.status_code == 304
+    assert db.queries == queries
+    assert get_historical(db, timeframe="5m", headers={"If-None-Match": etag}).status_code == 200
+
+def test_recent_range_still_answers_when_redis_is_down(monkeypatch):
+    class DownRedis:
+        async def mget(self, keys):
+            raise RedisConnectionError("down")
+
+    monkeypatch.setattr(cache, "r", DownRedis())
+    now = datetime.now(timezone.utc)
+
+    response = get_historical(FakeMarketDB(3), start_date=(now - timedelta(hours=1)).isoformat(), end_date=now.isoformat())
+
+    assert response.status_code == 200
+    assert response.headers["etag"]
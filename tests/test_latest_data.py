@@ -0,0 +1,117 @@
+# tests/test_latest_data.py
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.auth import get_current_user_bearer
+from app.db.database import get_db
+from app.services import latest_data
+from app.services.latest_data import LatestBarTable
+
+TIME = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+class FakeLatestDB:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.queries = []
+
+    async def fetch_all(self, query, values):
+        self.queries.append(values["symbols"])
+        return [
+            {"symbol": s, "time": TIME, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 100}
+            for s in values["symbols"] if s in self.symbols
+        ]
+
+def get_latest(db, symbols):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        return TestClient(app).get("/api/v1/market-data/latest", params={"symbols": symbols})
+    finally:
+        app.dependency_overrides.clear()
+
+def test_bulk_latest_batches_cache_and_database(fake_redis):
+    db = FakeLatestDB({"AAPL", "MSFT"})
+
+    response = get_latest(db, "aapl,MSFT,NOPE,AAPL")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert list(body) == ["AAPL", "MSFT", "NOPE"]
+    assert body["AAPL"]["close"] == 1.5
+    assert body["NOPE"] is None
+    assert db.queries == [["AAPL", "MSFT", "NOPE"]]
+    # One MGET and one pipelined write
+    assert fake_redis.round_trips == 2
+
+def test_bulk_latest_only_queries_misses(fake_redis):
+    db = FakeLatestDB({"AAPL", "MSFT"})
+    get_latest(db, "AAPL")
+
+    response = get_latest(db, "AAPL,MSFT")
+
+    assert response.json()["AAPL"]["time"] == TIME.isoformat()
+    assert db.queries == [["AAPL"], ["MSFT"]]
+
+def test_bulk_latest_requires_symbols(fake_redis):
+    assert get_latest(FakeLatestDB(set()), " , ").status_code == 400
+
+def live_bar(symbol, close):
+    return {"symbol": symbol, "time": TIME, "open": 1.0, "high": 2.0, "low": 0.5, "close": close, "volume": 5, "timeframe": "1s"}
+
+def test_live_table_answers_before_cache_and_database(fake_redis, monkeypatch):
+    monkeypatch.setattr(latest_data.latest_bars, "_bars", {})
+    latest_data.latest_bars.update(live_bar("AAPL", 9.0))
+    db = FakeLatestDB({"AAPL", "MSFT"})
+
+    body = get_latest(db, "AAPL,MSFT").json()
+
+    assert body["AAPL"]["close"] == 9.0
+    assert "timeframe" not in body["AAPL"]
+    assert body["MSFT"]["close"] == 1.5
+    assert db.queries == [["MSFT"]]
+
+def test_stale_live_entries_fall_back(monkeypatch):
+    table = LatestBarTable(max_age_seconds=10)
+    table.update(live_bar("AAPL", 9.0))
+    assert table.get("AAPL")["close"] == 9.0
+
+    monkeypatch.setattr(latest_data.time, "monotonic", lambda: 1e12)
+    assert table.get("AAPL") is None
+
+def test_single_latest_not_found(fake_redis):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: FakeLatestDB(set())
+    try:
+        assert TestClient(app).get("/api/v1/market-data/latest/NOPE").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+def test_single_latest_revalidates_with_etag(fake_redis):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: FakeLatestDB({"AAPL"})
+    try:
+        client = TestClient(app)
+        first = client.get("/api/v1/market-data/latest/AAPL")
+        second = client.get("/api/v1/market-data/latest/AAPL", headers={"If-None-Match": first.headers["etag"]})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+
+def test_single_latest_etag_covers_the_whole_bar(fake_redis, monkeypatch):
+    app.dependency_overrides[get_current_user_bearer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: FakeLatestDB({"AAPL"})
+    try:
+        client = TestClient(app)
+        stored = client.get("/api/v1/market-data/latest/AAPL")
+        live = LatestBarTable()
+        live.update({"symbol": "AAPL", "time": TIME, "open": 1.0, "high": 1.2, "low": 0.9, "close": 1.1, "volume": 3})
+        monkeypatch.setattr(latest_data.latest_bars, "_bars", live._bars)
+        second = client.get("/api/v1/market-data/latest/AAPL", headers={"If-None-Match": stored.headers["etag"]})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert second.status_code == 200
+    assert second.json()["close"] == 1.1
@@ -0,0 +1,70 @@
+# tests/test_local_cache.py
+import pytest
+from app.core import cache
+from app.core.cache import INVALIDATION_CHANNEL, WORKER_ID, LocalCache, get_many_values, handle_invalidation, invalidate, set_many_values
+
+@pytest.fixture
+def l1(monkeypatch):
+    local = LocalCache(max_entries=2, ttl=5)
+    local.enabled = True
+    monkeypatch.setattr(cache, "local_cache", local)
+    return local
+
+def test_lru_eviction_and_ttl(l1, monkeypatch):
+    l1.set("a", 1)
+    l1.set("b", 2)
+    assert l1.get("a") == (True, 1)
+    l1.set("c", 3)
+
+    assert l1.get("b") == (False, None)
+    assert l1.evictions == 1
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 6)
+    assert l1.get("a") == (False, None)
+
+def test_disabled_cache_stores_nothing():
+    local = LocalCache()
+    local.set("a", 1)
+    assert local.get("a") == (False, None)
+
+@pytest.mark.asyncio
+async def test_hot_keys_are_served_from_l1(fake_redis, l1):
+    await set_many_values({"latest_data:AAPL": {"close": 1.5}, "hist:AAPL:2024-01-02": b"x"})
+    round_trips = fake_redis.round_trips
+
+    assert await get_many_values(["latest_data:AAPL"]) == [{"close": 1.5}]
+    assert fake_redis.round_trips == round_trips
+    # Only L1 namespaces are announced to other workers
+    assert fake_redis.published == [(INVALIDATION_CHANNEL, f"{WORKER_ID}\nlatest_data:AAPL")]
+
+@pytest.mark.asyncio
+async def test_other_workers_writes_invalidate_l1(fake_redis, l1):
+    await set_many_values({"latest_data:AAPL": {"close": 1.5}})
+
+    handle_invalidation(f"{WORKER_ID}\nlatest_data:AAPL".encode())
+    assert l1.get("latest_data:AAPL")[0]
+    handle_invalidation(b"other-worker\nlatest_data:AAPL")
+    assert not l1.get("latest_data:AAPL")[0]
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_both_tiers(fake_redis, l1):
+    await set_many_values({"latest_data:AAPL": {"close": 1.5}})
+
+    await invalidate(["latest_data:AAPL"])
+
+    assert await get_many_values(["latest_data:AAPL"]) == [None]
+
+@pytest.mark.asyncio
+async def test_l1_copies_of_redis_reads_expire_with_the_redis_key(fake_redis, l1, monkeypatch):
+    await set_many_values({"latest_data:AAPL": {"close": 1.5}, "latest_data:MSFT": {"close": 2.5}}, expiration=60)
+    l1.clear()
+    # AAPL is about to expire in Redis; MSFT has a minute left
+    fake_redis.expiry["latest_data:AAPL"] = 0.5
+
+    await get_many_values(["latest_data:AAPL", "latest_data:MSFT"])
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 1)
+    assert l1.get("latest_data:AAPL") == (False, None)
+    assert l1.get("latest_data:MSFT") == (True, {"close": 2.5})
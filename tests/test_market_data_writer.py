@@ -0,0 +1,62 @@
+# tests/test_market_data_writer.py
+import json
+import pytest
+from datetime import datetime, timezone
+from app.services.historical_data import rollup_table_for
+from app.services.market_data_writer import MarketDataWriter, WRITE_BARS_QUERY
+
+TIME = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc)
+
+class FakeWriteDB:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def execute(self, query, values):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.calls.append((query, json.loads(values["bars"])))
+
+def bar(timeframe="1m", close=1.0):
+    return {"symbol": "AAPL", "time": TIME, "open": 1.0, "high": 2.0, "low": 0.5, "close": close, "volume": 10, "timeframe": timeframe}
+
+@pytest.mark.asyncio
+async def test_writer_batches_minute_bars_into_one_statement():
+    db = FakeWriteDB()
+    writer = MarketDataWriter(lambda: db)
+    writer.add(bar(close=1.0))
+    writer.add(bar(timeframe="5m"))
+    writer.add(bar(close=2.0))
+
+    assert await writer.flush() == 2
+    assert await writer.flush() == 0
+    query, bars = db.calls[0]
+    assert query is WRITE_BARS_QUERY
+    assert [b["close"] for b in bars] == [1.0, 2.0]
+    assert "timeframe" not in bars[0]
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_bars_for_retry():
+    db = FakeWriteDB(fail=True)
+    writer = MarketDataWriter(lambda: db)
+    writer.add(bar())
+
+    assert await writer.flush() == 0
+    db.fail = False
+    assert await writer.flush() == 1
+    assert writer.written == 1
+
+def test_rollups_feed_from_inserted_rows_only():
+    assert "ON CONFLICT (symbol, time) DO NOTHING" in WRITE_BARS_QUERY
+    assert WRITE_BARS_QUERY.count("FROM inserted") == 2
+
+@pytest.mark.parametrize("seconds,table", [
+    (86400, "market_data_1d"),
+    (5 * 86400, "market_data_1d"),
+    (3600, "market_data_1h"),
+    (4 * 3600, "market_data_1h"),
+    (900, None),
+    (5400, None),
+])
+def test_rollup_routing_picks_coarsest_table(seconds, table):
+    assert rollup_table_for(seconds) == table
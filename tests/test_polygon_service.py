@@ -0,0 +1,21 @@
+# tests/test_polygon_service.py
+import json
+import logging
+import pytest
+from app.services.polygon_service import PolygonWebSocket
+
+@pytest.mark.asyncio
+async def test_status_frames_are_logged_and_not_queued(caplog):
+    polygon = PolygonWebSocket(fetch_symbol_details=False)
+    frame = json.dumps([
+        {"ev": "status", "status": "auth_failed", "message": "authentication failed"},
+        {"ev": "status", "status": "success", "message": "subscribed to: A.AAPL"},
+    ])
+
+    with caplog.at_level(logging.INFO, logger="app.services.polygon_service"):
+        await polygon.handle_frame(frame)
+
+    errors = [r.getMessage() for r in caplog.records if r.levelno == logging.ERROR]
+    assert errors == ["Polygon status: auth_failed: authentication failed"]
+    assert any("subscribed to: A.AAPL" in r.getMessage() for r in caplog.records)
+    assert polygon.message_handler.handler_queue.empty()
@@ -0,0 +1,56 @@
+# tests/test_resampling.py
+from datetime import datetime
+import numpy as np
+from app.services.bar_aggregator import MARKET_TZ
+from app.services.resampling import downsample_lttb, lttb_indices, resample_ohlcv
+
+def et_ns(day, hour, minute):
+    return int(datetime(2024, 3, day, hour, minute, tzinfo=MARKET_TZ).timestamp()) * 10**9
+
+def minute_columns(day, start_hour, start_minute, count):
+    first = et_ns(day, start_hour, start_minute)
+    return {
+        "time": first + np.arange(count, dtype=np.int64) * 60 * 10**9,
+        "open": np.arange(count, dtype=np.float64),
+        "high": np.arange(count, dtype=np.float64) + 1,
+        "low": np.arange(count, dtype=np.float64) - 1,
+        "close": np.arange(count, dtype=np.float64) + 0.5,
+        "volume": np.ones(count),
+    }
+
+def test_resample_to_five_minutes():
+    bars = resample_ohlcv(minute_columns(5, 10, 0, 12), 300)
+
+    assert len(bars["time"]) == 3
+    assert bars["time"][1] == et_ns(5, 10, 5)
+    assert (bars["open"][0], bars["high"][0], bars["low"][0], bars["close"][0], bars["volume"][0]) == (0, 5, -1, 4.5, 5)
+    assert bars["volume"][2] == 2
+
+def test_hourly_buckets_align_to_session_open():
+    # 09:00-10:59 spans the pre-market close and the regular open
+    bars = resample_ohlcv(minute_columns(5, 9, 0, 120), 3600)
+
+    starts = [datetime.fromtimestamp(t / 1e9, tz=MARKET_TZ).strftime("%H:%M") for t in bars["time"]]
+    assert starts == ["09:00", "09:30", "10:30"]
+    assert list(bars["volume"]) == [30, 60, 30]
+
+def test_daily_buckets_use_eastern_dates():
+    columns = minute_columns(5, 19, 0, 120)  # runs past 20:00 ET into the next UTC day
+    bars = resample_ohlcv(columns, 86400)
+    assert len(bars["time"]) == 1
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[500] = 100
+
+    indices = lttb_indices(x, y, 20)
+
+    assert len(indices) == 20
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 500 in indices
+    assert np.all(np.diff(indices) > 0)
+
+def test_downsample_is_noop_below_threshold():
+    columns = minute_columns(5, 10, 0, 10)
+    assert downsample_lttb(columns, 50) is columns
@@ -0,0 +1,74 @@
+# tests/test_single_flight.py
+import asyncio
+import pytest
+from app.core import cache
+from app.core.cache import get_many_or_load, get_or_load
+
+class CountingLoader:
+    def __init__(self, delay=0.01, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("database down")
+        return {key: {"loaded": key} for key in keys if key != "k:none"}
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(fake_redis):
+    loader = CountingLoader()
+
+    results = await asyncio.gather(*[get_many_or_load(["k:a"], loader, 60) for _ in range(20)])
+
+    assert loader.calls == [["k:a"]]
+    assert all(r == [{"loaded": "k:a"}] for r in results)
+
+@pytest.mark.asyncio
+async def test_overlapping_batches_only_load_their_own_misses(fake_redis):
+    loader = CountingLoader()
+
+    first, second = await asyncio.gather(
+        get_many_or_load(["k:a", "k:b"], loader, 60),
+        get_many_or_load(["k:b", "k:c", "k:none"], loader, 60),
+    )
+
+    assert loader.calls == [["k:a", "k:b"], ["k:c", "k:none"]]
+    assert second == [{"loaded": "k:b"}, {"loaded": "k:c"}, None]
+
+@pytest.mark.asyncio
+async def test_load_errors_reach_every_waiter(fake_redis):
+    loader = CountingLoader(fail=True)
+
+    results = await asyncio.gather(*[get_many_or_load(["k:a"], loader, 60) for _ in range(3)], return_exceptions=True)
+
+    assert len(loader.calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not cache._in_flight
+
+@pytest.mark.asyncio
+async def test_hits_near_expiry_refresh_in_the_background(fake_redis, monkeypatch):
+    loader = CountingLoader(delay=0)
+    await get_many_or_load(["k:a"], loader, 60)
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 59.999)
+
+    value = await get_many_or_load(["k:a"], loader, 60, early_refresh_beta=1e6)
+    await asyncio.gather(*cache._background)
+
+    assert value == [{"loaded": "k:a"}]
+    assert len(loader.calls) == 2
+
+@pytest.mark.asyncio
+async def test_get_or_load_single_key(fake_redis):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return 42
+
+    assert await get_or_load("k:x", load, 60) == 42
+    assert await get_or_load("k:x", load, 60) == 42
+    assert calls == [1]
@@ -0,0 +1,188 @@
+# tests/test_strategies.py
+import json
+import pytest
+from unittest.mock import AsyncMock
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import auth
+from app.api.auth import create_access_token, get_current_user
+from app.db.database import get_db
+from app.models.strategy import Strategy
+from app.models.user import User
+from app.services.strategy_cache import get_cached_strategy, strategy_cache_key, strategy_changed
+
+NOW = datetime(2024, 1, 2, tzinfo=timezone.utc)
+USER = User(user_id=7, username="trader", email="trader@example.com", created_at=NOW)
+
+def strategy_row(strategy_id, components=2):
+    return {
+        "id": strategy_id, "user_id": USER.user_id, "name": f"Strategy {strategy_id}", "description": "",
+        "is_active": True, "asset_filters": [{"type": "symbol", "value": "AAPL"}], "additional_config": {},
+        "created_at": NOW, "updated_at": NOW,
+        "components": [
+            {"id": strategy_id * 10 + i, "strategy_id": strategy_id, "component_type": "entry",
+             "conditions": [{"type": "price_change", "comparison": "greater_than", "value": 5}],
+             "exit_conditions": [], "parameters": {"action": "buy"}}
+            for i in range(components)
+        ],
+    }
+
+class FakeStrategyDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch_all(self, query, values):
+        self.queries.append(values)
+        rows = [r for r in self.rows if r["user_id"] == values["user_id"] and r["id"] > values["after_id"]]
+        return rows[:values["limit"]]
+
+    async def fetch_one(self, query, values):
+        self.queries.append(values)
+        return next((r for r in self.rows if r["id"] == values["id"] and r["user_id"] == values["user_id"]), None)
+
+    async def execute(self, query, values):
+        self.queries.append(values)
+        if query.startswith("DELETE FROM strategies"):
+            self.rows = [r for r in self.rows if r["id"] != values["id"]]
+        return 1
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+def request(db, method, path, **kwargs):
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        return TestClient(app).request(method, path, **kwargs)
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        app.dependency_overrides.pop(get_db, None)
+
+def test_list_is_one_query_per_page():
+    db = FakeStrategyDB([strategy_row(i) for i in range(1, 6)])
+
+    first = request(db, "GET", "/api/v1/strategies", params={"limit": 2})
+    second = request(db, "GET", "/api/v1/strategies", params={"limit": 2, "after_id": first.json()[-1]["id"]})
+
+    assert [s["id"] for s in first.json()] == [1, 2]
+    assert [s["id"] for s in second.json()] == [3, 4]
+    assert len(first.json()[0]["components"]) == 2
+    assert db.queries == [
+        {"user_id": 7, "after_id": 0, "limit": 2},
+        {"user_id": 7, "after_id": 2, "limit": 2},
+    ]
+
+def test_get_strategy_is_scoped_to_the_user(fake_redis):
+    db = FakeStrategyDB([strategy_row(1), dict(strategy_row(2), user_id=8)])
+
+    assert request(db, "GET", "/api/v1/strategies/1").json()["components"][1]["id"] == 11
+    assert request(db, "GET", "/api/v1/strategies/2").status_code == 404
+
+class FakeWriteDB:
+    """Answers the single-statement create/update with the rows it would return."""
+
+    def __init__(self, existing_ids=()):
+        self.existing_ids = set(existing_ids)
+        self.queries = []
+
+    async def fetch_one(self, query, values):
+        self.queries.append((query, values))
+        strategy_id = values.get("id", 1)
+        if "UPDATE strategies" in query and strategy_id not in self.existing_ids:
+            return None
+        components = [
+            dict(component, id=100 + i, strategy_id=strategy_id)
+            for i, component in enumerate(json.loads(values["components"]))
+        ]
+        return {
+            "id": strategy_id, "user_id": values["user_id"], "name": values["name"], "description": values["description"],
+            "is_active": values["is_active"], "asset_filters": json.loads(values["asset_filters"]),
+            "additional_config": json.loads(values["additional_config"]),
+            "created_at": values["now"], "updated_at": values["now"], "components": components,
+        }
+
+STRATEGY = {
+    "name": "Momentum", "description": "", "asset_filters": [{"type": "symbol", "value": "AAPL"}],
+    "components": [
+        {"component_type": "entry", "conditions": [{"type": "price_change", "comparison": "greater_than", "value": 5}]},
+        {"component_type": "exit", "exit_conditions": [{"type": "stop_loss", "value": 2}]},
+        {"component_type": "exit", "exit_conditions": [{"type": "take_profit", "value": 10}]},
+    ],
+}
+
+def test_create_writes_strategy_and_components_in_one_statement(fake_redis):
+    db = FakeWriteDB()
+
+    response = request(db, "POST", "/api/v1/strategies", json=STRATEGY)
+
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()["components"]] == [100, 101, 102]
+    assert len(db.queries) == 1
+    query, values = db.queries[0]
+    assert "INSERT INTO strategy_components" in query
+    assert values["user_id"] == USER.user_id
+
+def test_update_replaces_components_in_one_statement(fake_redis):
+    db = FakeWriteDB(existing_ids={5})
+
+    response = request(db, "PUT", "/api/v1/strategies/5", json=dict(STRATEGY, name="Renamed"))
+    missing = request(db, "PUT", "/api/v1/strategies/6", json=STRATEGY)
+
+    assert response.json()["name"] == "Renamed"
+    assert len(response.json()["components"]) == 3
+    assert missing.status_code == 404
+    assert len(db.queries) == 2
+    assert "DELETE FROM strategy_components" in db.queries[0][0]
+
+def test_strategy_reads_are_cached_until_deleted(fake_redis):
+    db = FakeStrategyDB([strategy_row(1)])
+
+    first = request(db, "GET", "/api/v1/strategies/1")
+    second = request(db, "GET", "/api/v1/strategies/1")
+    assert first.json() == second.json()
+    assert len(db.queries) == 1
+
+    assert request(db, "DELETE", "/api/v1/strategies/1").status_code == 200
+    assert strategy_cache_key(USER.user_id, 1) not in fake_redis.store
+    assert request(db, "GET", "/api/v1/strategies/1").status_code == 404
+
+def test_updates_invalidate_the_cached_strategy(fake_redis):
+    db = FakeStrategyDB([strategy_row(5)])
+    request(db, "GET", "/api/v1/strategies/5")
+    request(FakeWriteDB(existing_ids={5}), "PUT", "/api/v1/strategies/5", json=dict(STRATEGY, name="Renamed"))
+    db.rows = [dict(strategy_row(5), name="Renamed")]
+
+    response = request(db, "GET", "/api/v1/strategies/5")
+
+    assert response.json()["name"] == "Renamed"
+    assert len(db.queries) == 2
+
+@pytest.mark.asyncio
+async def test_a_read_that_raced_a_write_does_not_cache_the_old_row(fake_redis):
+    async def load_before_the_update():
+        # The update commits while this read still holds the old row
+        await strategy_changed(USER.user_id, 5)
+        return Strategy(**strategy_row(5))
+
+    async def load_after_the_update():
+        return Strategy(**dict(strategy_row(5), name="Renamed"))
+
+    await get_cached_strategy(USER.user_id, 5, load_before_the_update)
+    strategy = await get_cached_strategy(USER.user_id, 5, load_after_the_update)
+
+    assert strategy.name == "Renamed"
+
+@pytest.mark.asyncio
+async def test_current_user_is_cached(fake_redis, monkeypatch):
+    db = FakeStrategyDB([])
+    db.fetch_one = AsyncMock(return_value=USER.model_dump())
+    monkeypatch.setattr(auth, "get_db", lambda: db)
+    token = create_access_token({"sub": str(USER.user_id)})
+
+    assert await get_current_user(token) == USER
+    assert await get_current_user(token) == USER
+    assert db.fetch_one.await_count == 1
@@ -1,7 +1,5 @@
 # tests/test_strategy_creation.py
 import pytest
-from httpx import AsyncClient
-from app.main import app
 from app.api.auth import create_access_token
 from app.models.user import User
 from datetime import datetime, timezone
@@ -19,12 +17,6 @@ def test_user():
 def access_token(test_user):
     return create_access_token(data={"sub": str(test_user.user_id)})
 
-@pytest.fixture
-async def authorized_client(access_token):
-    async with AsyncClient(app=app, base_url="http://test") as client:
-        client.headers.update({"Authorization": f"Bearer {access_token}"})
-        yield client
-
 @pytest.mark.asyncio
 async def test_create_simple_strategy(authorized_client):
     strategy_data = {
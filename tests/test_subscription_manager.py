@@ -0,0 +1,65 @@
+# tests/test_subscription_manager.py
+from app.services.subscription_manager import SubscriptionManager
+
+class FakeClient:
+    def __init__(self):
+        self.frames = []
+
+    def subscribe(self, *topics):
+        self.frames.append(("subscribe", topics))
+
+    def unsubscribe(self, *topics):
+        self.frames.append(("unsubscribe", topics))
+
+def test_upstream_tracks_union_of_owners():
+    client = FakeClient()
+    manager = SubscriptionManager(client, linger_seconds=0)
+    manager.acquire("alice", ["AAPL", "MSFT"])
+    manager.acquire("bob", ["AAPL", "TSLA"])
+
+    manager.reconcile(now=0)
+
+    assert client.frames == [("subscribe", ("A.AAPL", "A.MSFT", "A.TSLA"))]
+    assert manager.ref_count("AAPL") == 2
+
+def test_symbol_stays_while_another_owner_holds_it():
+    client = FakeClient()
+    manager = SubscriptionManager(client, linger_seconds=0)
+    manager.acquire("alice", ["AAPL"])
+    manager.acquire("bob", ["AAPL"])
+    manager.reconcile(now=0)
+
+    manager.release("alice", ["AAPL"], now=1)
+    assert manager.reconcile(now=1) == (set(), set())
+
+    manager.release_all("bob", now=2)
+    assert manager.reconcile(now=2) == (set(), {"AAPL"})
+    assert client.frames[-1] == ("unsubscribe", ("A.AAPL",))
+
+def test_released_symbols_linger_before_unsubscribing():
+    client = FakeClient()
+    manager = SubscriptionManager(client, linger_seconds=30)
+    manager.acquire("alice", ["AAPL"])
+    manager.reconcile(now=0)
+    manager.release("alice", ["AAPL"], now=10)
+
+    assert manager.reconcile(now=20) == (set(), set())
+
+    # Re-acquiring during the linger window causes no upstream traffic
+    manager.acquire("bob", ["AAPL"])
+    assert manager.reconcile(now=25) == (set(), set())
+
+    manager.release("bob", ["AAPL"], now=50)
+    assert manager.reconcile(now=81) == (set(), {"AAPL"})
+    assert len(client.frames) == 2
+
+def test_churn_between_reconciles_is_coalesced():
+    client = FakeClient()
+    manager = SubscriptionManager(client, linger_seconds=0)
+    manager.acquire("alice", ["AAPL"])
+    manager.release("alice", ["AAPL"], now=0)
+    manager.acquire("alice", ["MSFT"])
+
+    manager.reconcile(now=0)
+
+    assert client.frames == [("subscribe", ("A.MSFT",))]